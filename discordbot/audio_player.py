@@ -4,7 +4,6 @@ import tempfile
 import os
 import time
 import logging
-from concurrent.futures import ProcessPoolExecutor
 
 # Import the shared bot instance with package-safe relative import first so
 # audio tasks launched after command setup can reference it without
@@ -16,27 +15,49 @@ except Exception:  # script fallback
         from bot_instance import bot  # type: ignore
     except Exception:  # final fallback placeholder (should not happen in normal runs)
         bot = None  # type: ignore
+try:
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+try:
+    from .voice_manager import ensure_connected, schedule_idle_disconnect  # type: ignore
+except ImportError:  # script fallback
+    from voice_manager import ensure_connected, schedule_idle_disconnect  # type: ignore
+try:
+    from .ytdlp_resolver import get_info as ytdlp_resolve_info  # type: ignore
+except ImportError:  # script fallback
+    from ytdlp_resolver import get_info as ytdlp_resolve_info  # type: ignore
+try:
+    from .audio_sources import wav_pcm_source  # type: ignore
+except ImportError:  # script fallback
+    from audio_sources import wav_pcm_source  # type: ignore
 
 _voice_audio_queues = {}
 _voice_locks = {}
 _voice_now_playing = {}
-_voice_skip_flag = {}
 _voice_seek_flag = {}
 _progress_tasks = {}
 _voice_queue_running = {}
 
+# Per-guild playback events: "done" is set from the vc.play(after=...) callback,
+# "skip"/"seek"/"stop" are set by the control helpers at the bottom of this module.
+_voice_events = {}
+# Incremented on every vc.play() so a stale after-callback (e.g. the source we
+# just replaced while seeking) cannot end the track that replaced it.
+_voice_play_generation = {}
+
 # Persistent per-guild progress message to reuse across tracks within a session
 _persistent_progress = {}
 
 # Rotation stop requests, set by the player Stop button and consumed by music rotation logic
 _rotation_stop_requests = {}
 
-YTDLP_EXECUTOR = ProcessPoolExecutor(max_workers=6)
-
-def ytdlp_get_info(url):
-    import yt_dlp
-    with yt_dlp.YoutubeDL({'quiet': True, 'noplaylist': True, "format": "bestaudio"}) as ydl:
-        return ydl.extract_info(url, download=False)
+# Next-track warm-up: guild id -> (stream url, FFmpegPCMAudio started ahead of time)
+_prewarmed_sources = {}
+_prewarm_tasks = {}
+DEFAULT_PREWARM_SECONDS = 10
+# A warmed source that was never played is dropped after this long
+PREWARM_TTL_SECONDS = 120
 
 def get_voice_channel(interaction, specified: discord.VoiceChannel = None):
     if hasattr(interaction.user, "voice") and interaction.user.voice and interaction.user.voice.channel:
@@ -176,22 +197,8 @@ async def play_audio(
         raise RuntimeError("Bot instance unavailable in play_audio (import failed).")
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} not found.")
-    guild = interaction.guild
-    gid = guild.id if guild else 0
-    if gid not in _voice_audio_queues:
-        _voice_audio_queues[gid] = asyncio.Queue()
-    if gid not in _voice_locks:
-        _voice_locks[gid] = asyncio.Lock()
-    queue = _voice_audio_queues[gid]
-    lock = _voice_locks[gid]
-    fut = asyncio.get_event_loop().create_future()
     # Initially no message/view
-    await queue.put((file_path, fut, voice_channel, interaction, False, duration, title, video_url, announce_message, loop, is_live, 0, None, None))
-    # --- ONLY START RUNNER IF NOT RUNNING ---
-    if not _voice_queue_running.get(gid):
-        _voice_queue_running[gid] = True
-        asyncio.create_task(_run_audio_queue(guild, queue, lock, gid))
-    await fut
+    await _enqueue_and_wait(interaction, file_path, voice_channel, False, duration, title, video_url, announce_message, loop, is_live)
 
 async def play_ytdlp_stream(
     interaction,
@@ -207,6 +214,40 @@ async def play_ytdlp_stream(
 ):
     if bot is None:
         raise RuntimeError("Bot instance unavailable in play_ytdlp_stream (import failed).")
+    if loop:
+        stream_identifier = info_dict.get("webpage_url") or info_dict.get("original_url", info_dict.get("url"))
+    else:
+        stream_identifier = _stream_url_from_info(info_dict)
+    await _enqueue_and_wait(interaction, stream_identifier, voice_channel, True, duration, title, video_url, announce_message, loop, is_live)
+
+def _stream_url_from_info(info_dict):
+    stream_url = info_dict.get("url")
+    if not stream_url:
+        for f in reversed(info_dict.get("formats", [])):
+            if f.get("acodec") != "none" and f.get("vcodec") == "none":
+                return f.get("url")
+    return stream_url
+
+async def play_source(
+    interaction,
+    source,
+    voice_channel,
+    *,
+    duration=None,
+    title=None,
+    video_url=None,
+    announce_message=False,
+):
+    """Queue a custom audio input (see audio_sources) instead of a file path or URL.
+
+    `source` must expose `create_source(offset) -> discord.AudioSource` and
+    `close()`; it is closed once its turn in the queue is over.
+    """
+    if bot is None:
+        raise RuntimeError("Bot instance unavailable in play_source (import failed).")
+    await _enqueue_and_wait(interaction, source, voice_channel, False, duration, title, video_url, announce_message, False, False)
+
+async def _enqueue_and_wait(interaction, to_play, voice_channel, use_stream, duration, title, video_url, announce_message, loop, is_live):
     guild = interaction.guild
     gid = guild.id if guild else 0
     if gid not in _voice_audio_queues:
@@ -216,16 +257,10 @@ async def play_ytdlp_stream(
     queue = _voice_audio_queues[gid]
     lock = _voice_locks[gid]
     fut = asyncio.get_event_loop().create_future()
-    if loop:
-        stream_identifier = info_dict.get("webpage_url") or info_dict.get("original_url", info_dict.get("url"))
-    else:
-        stream_identifier = info_dict.get("url")
-        if not stream_identifier:
-            for f in reversed(info_dict.get("formats", [])):
-                if f.get("acodec") != "none" and f.get("vcodec") == "none":
-                    stream_identifier = f.get("url")
-                    break
-    await queue.put((stream_identifier, fut, voice_channel, interaction, True, duration, title, video_url, announce_message, loop, is_live, 0, None, None))
+    if use_stream and not loop and isinstance(to_play, str) and queue.empty() and gid in _voice_now_playing:
+        # This stream is next in line: start ffmpeg shortly before the current track ends
+        _schedule_prewarm(gid, to_play)
+    await queue.put((to_play, fut, voice_channel, interaction, use_stream, duration, title, video_url, announce_message, loop, is_live, 0, None, None))
     # --- ONLY START RUNNER IF NOT RUNNING ---
     if not _voice_queue_running.get(gid):
         _voice_queue_running[gid] = True
@@ -242,6 +277,168 @@ async def _run_audio_queue(guild, queue, lock, gid):
             await _process_audio_item(guild, gid, item)
     finally:
         _voice_queue_running[gid] = False
+        # Keep the connection for the next burst of clips; voice_manager drops it when idle
+        schedule_idle_disconnect(guild)
+
+def _get_voice_events(gid):
+    events = _voice_events.get(gid)
+    if events is None:
+        events = {
+            "done": asyncio.Event(),
+            "skip": asyncio.Event(),
+            "seek": asyncio.Event(),
+            "stop": asyncio.Event(),
+        }
+        _voice_events[gid] = events
+    return events
+
+def _on_playback_finished(gid, generation, error):
+    # Runs on the event loop, scheduled by the player thread's after-callback.
+    if error:
+        logging.warning("Voice player reported an error for guild %s: %s", gid, error)
+    if _voice_play_generation.get(gid) != generation:
+        return
+    events = _voice_events.get(gid)
+    if events:
+        events["done"].set()
+
+def _start_playback(vc, gid, audio_source):
+    loop = asyncio.get_running_loop()
+    generation = _voice_play_generation.get(gid, 0) + 1
+    _voice_play_generation[gid] = generation
+    _get_voice_events(gid)["done"].clear()
+
+    def after(error):
+        try:
+            loop.call_soon_threadsafe(_on_playback_finished, gid, generation, error)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    if vc.is_playing() or vc.is_paused():
+        vc.stop()
+    vc.play(audio_source, after=after)
+
+async def _wait_for_playback_event(gid):
+    """Block until the current track ends or a control event is raised; return the fired names."""
+    events = _get_voice_events(gid)
+    waiters = {asyncio.ensure_future(ev.wait()): name for name, ev in events.items()}
+    try:
+        done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for w in waiters:
+            if not w.done():
+                w.cancel()
+    return {waiters[w] for w in done}
+
+def _make_audio_source(to_play, use_stream, offset):
+    if hasattr(to_play, "create_source"):
+        return to_play.create_source(offset)
+    if not use_stream and str(to_play).lower().endswith(".wav"):
+        # Rendered TTS clips are plain PCM: skip the ffmpeg process
+        source = wav_pcm_source(to_play, offset)
+        if source is not None:
+            return source
+    ss = f"-ss {offset}" if offset and offset > 0 else ""
+    if not use_stream:
+        return discord.FFmpegPCMAudio(
+            to_play,
+            before_options=ss,
+        )
+    return discord.FFmpegPCMAudio(
+        to_play,
+        before_options=f"{ss} -reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5".strip(),
+        options="-vn",
+    )
+
+def _prewarm_lead() -> float:
+    cfg = get_config() or {}
+    try:
+        return max(0.0, float(cfg.get("audio_prewarm_seconds", DEFAULT_PREWARM_SECONDS)))
+    except (TypeError, ValueError):
+        return float(DEFAULT_PREWARM_SECONDS)
+
+def _discard_prewarmed(gid):
+    task = _prewarm_tasks.pop(gid, None)
+    if task and not task.done():
+        task.cancel()
+    entry = _prewarmed_sources.pop(gid, None)
+    if entry:
+        entry[1].cleanup()
+
+def _expire_prewarmed(gid, source):
+    entry = _prewarmed_sources.get(gid)
+    if entry and entry[1] is source:
+        _prewarmed_sources.pop(gid, None)
+        source.cleanup()
+
+def _take_prewarmed(gid, to_play, offset):
+    """Return the warmed source for `to_play` if there is one, dropping any other."""
+    entry = _prewarmed_sources.pop(gid, None)
+    if entry is None:
+        return None
+    url, source = entry
+    if url == to_play and not offset:
+        return source
+    source.cleanup()
+    return None
+
+async def _prewarm_when_due(gid, stream_url, lead):
+    # Wait until the current track is `lead` seconds from its end, then spawn
+    # ffmpeg so the connection and probing are done before the next item starts.
+    seen_current = False
+    waited = 0
+    while True:
+        info = _voice_now_playing.get(gid)
+        if info is None:
+            if seen_current or waited >= 30:
+                return  # current track already over; the next one starts cold
+            waited += 1
+            await asyncio.sleep(1)
+            continue
+        seen_current = True
+        if info.get("is_live") or not info.get("duration") or info.get("playing_file_path") == stream_url:
+            return
+        remaining = info["duration"] - (time.time() - info["start_time"])
+        if remaining <= lead:
+            break
+        await asyncio.sleep(min(remaining - lead, 5))
+    try:
+        source = _make_audio_source(stream_url, True, 0)
+    except Exception as ex:
+        logging.debug("Prewarm failed for guild %s: %s", gid, ex)
+        return
+    old = _prewarmed_sources.pop(gid, None)
+    if old:
+        old[1].cleanup()
+    _prewarmed_sources[gid] = (stream_url, source)
+    asyncio.get_running_loop().call_later(PREWARM_TTL_SECONDS, _expire_prewarmed, gid, source)
+
+def _schedule_prewarm(gid, stream_url):
+    lead = _prewarm_lead()
+    if lead <= 0 or not stream_url:
+        return
+    _discard_prewarmed(gid)
+    _prewarm_tasks[gid] = asyncio.create_task(_prewarm_when_due(gid, stream_url, lead))
+
+def prewarm_ytdlp_stream(guild_id, info_dict):
+    """Warm up `info_dict`'s audio stream as the next thing this guild will play.
+
+    For callers such as /music that resolve the next track while the current
+    one plays but only queue it once the current one has ended.
+    """
+    if info_dict.get("is_live") or info_dict.get("live_status") == "is_live":
+        return
+    _schedule_prewarm(guild_id, _stream_url_from_info(info_dict))
+
+def _cleanup_item_file(file_path, use_stream):
+    if hasattr(file_path, "close"):
+        file_path.close()
+        return
+    try:
+        if not use_stream and file_path.startswith(tempfile.gettempdir()) and os.path.exists(file_path):
+            os.remove(file_path)
+    except Exception as ex:
+        logging.warning("Audio cleanup warning: %s", ex)
 
 async def _process_audio_item(guild, gid, item):
     if bot is None:
@@ -254,24 +451,16 @@ async def _process_audio_item(guild, gid, item):
         progress_msg, seek_view
     ) = item
     vc = None
+    events = _get_voice_events(gid)
     try:
-        vc = discord.utils.get(bot.voice_clients, guild=guild)
-        if not vc or not vc.is_connected():
-            try:
-                vc = await voice_channel.connect()
-            except Exception as conn_ex:
-                logging.exception("Failed to connect to voice channel %s: %s", voice_channel, conn_ex)
-                if not fut.done():
-                    fut.set_exception(conn_ex)
-                return
-        elif vc.channel != voice_channel:
-            try:
-                await vc.move_to(voice_channel)
-            except Exception as move_ex:
-                logging.exception("Failed to move to voice channel %s: %s", voice_channel, move_ex)
-                if not fut.done():
-                    fut.set_exception(move_ex)
-                return
+        # Reuses the guild's live connection when there is one (see voice_manager)
+        try:
+            vc = await ensure_connected(guild, voice_channel)
+        except Exception as conn_ex:
+            logging.exception("Failed to connect to voice channel %s: %s", voice_channel, conn_ex)
+            if not fut.done():
+                fut.set_exception(conn_ex)
+            return
         should_loop = loop_flag
         # Only create a new progress bar announcement if requested; otherwise try to reuse a persistent one
         if progress_msg is None:
@@ -290,22 +479,15 @@ async def _process_audio_item(guild, gid, item):
                     view = ProgressView(guild.id, duration=duration, is_live=is_live)
                     progress_msg = pm
                     seek_view = view
-        loop_async = asyncio.get_running_loop()
         base_seek = seek_pos
+        interrupted = False
         while True:
             # yt-dlp url re-extraction for looping
             if use_stream and should_loop:
                 url_to_play = file_path
                 try:
-                    info_dict = await loop_async.run_in_executor(
-                        YTDLP_EXECUTOR, ytdlp_get_info, url_to_play
-                    )
-                    stream_url = info_dict.get("url")
-                    if not stream_url:
-                        for f in reversed(info_dict.get("formats", [])):
-                            if f.get("acodec") != "none" and f.get("vcodec") == "none":
-                                stream_url = f.get("url")
-                                break
+                    info_dict = await ytdlp_resolve_info(url_to_play)
+                    stream_url = _stream_url_from_info(info_dict)
                     if not stream_url:
                         raise RuntimeError("Aucun flux audio direct trouvé pour la vidéo (loop).")
                     if info_dict.get("title"): title = info_dict.get("title", title)
@@ -319,6 +501,8 @@ async def _process_audio_item(guild, gid, item):
                     break
             else:
                 to_play = file_path
+            if not vc.is_connected():
+                break
             seek_offset = base_seek or 0
             base_seek = 0
             _voice_now_playing[gid] = {
@@ -337,102 +521,56 @@ async def _process_audio_item(guild, gid, item):
             }
             if progress_msg:
                 _progress_tasks[gid] = asyncio.create_task(_update_progress_message(gid))
-            _voice_skip_flag[gid] = False
             _voice_seek_flag[gid] = 0
-            # Only play if not playing already
-            if vc.is_playing():
-                vc.stop()
-                for _ in range(20):
-                    if not vc.is_playing():
-                        break
-                    await asyncio.sleep(0.1)
-            def start_play():
-                offset = seek_offset or 0
-                ss = f"-ss {offset}" if offset > 0 else ""
-                if not use_stream:
-                    return discord.FFmpegPCMAudio(
-                        to_play,
-                        before_options=ss,
-                    )
-                else:
-                    return discord.FFmpegPCMAudio(
-                        to_play,
-                        before_options=f"{ss} -reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5".strip(),
-                        options="-vn",
-                    )
-            audio_source = start_play()
+            for name in ("skip", "seek", "stop"):
+                events[name].clear()
             try:
-                vc.play(audio_source)
+                audio_source = _take_prewarmed(gid, to_play, seek_offset) or _make_audio_source(to_play, use_stream, seek_offset)
+                _start_playback(vc, gid, audio_source)
             except discord.errors.ClientException as e:
                 logging.exception("VC play() failed: %s", e)
                 if not fut.done():
                     fut.set_exception(e)
                 break
-            # Playback/Skip/Seek logic
-            while vc.is_connected():
-                if _voice_skip_flag.get(gid, False):
-                    if vc.is_playing():
+            # Playback/Skip/Seek logic: sleep until the after-callback or a control event fires
+            while True:
+                fired = await _wait_for_playback_event(gid)
+                if "skip" in fired or "stop" in fired:
+                    interrupted = True
+                    if vc.is_playing() or vc.is_paused():
                         vc.stop()
                     break
-                seek_jump = _voice_seek_flag.get(gid, 0)
-                if seek_jump:
-                    current_elapsed = int(time.time() - _voice_now_playing[gid]["start_time"])
-                    new_elapsed = current_elapsed + seek_jump
-                    if duration:
-                        new_elapsed = max(0, min(new_elapsed, duration-1))
+                if "seek" in fired:
+                    events["seek"].clear()
+                    seek_jump = _voice_seek_flag.get(gid, 0)
                     _voice_seek_flag[gid] = 0
-
-                    # Stop current playback
-                    if vc.is_playing():
-                        vc.stop()
-                        # Wait for it to actually stop
-                        for _ in range(20):
-                            if not vc.is_playing():
-                                break
-                            await asyncio.sleep(0.1)
-
-                    # Update the start time to reflect the new position
-                    _voice_now_playing[gid]["start_time"] = time.time() - new_elapsed
-                    _voice_now_playing[gid]["offset"] = new_elapsed
-
-                    # Create new audio source with the seek position
-                    def create_seek_audio():
-                        ss = f"-ss {new_elapsed}" if new_elapsed > 0 else ""
-                        if not use_stream:
-                            return discord.FFmpegPCMAudio(
-                                to_play,
-                                before_options=ss,
-                            )
-                        else:
-                            return discord.FFmpegPCMAudio(
-                                to_play,
-                                before_options=f"{ss} -reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5".strip(),
-                                options="-vn",
-                            )
-
-                    # Start playing from the new position
-                    try:
-                        seek_audio_source = create_seek_audio()
-                        vc.play(seek_audio_source)
-                    except discord.errors.ClientException:
-                        # If we can't create the new source, continue with the original logic
-                        pass
-                if not vc.is_playing():
+                    if seek_jump and vc.is_connected():
+                        current_elapsed = int(time.time() - _voice_now_playing[gid]["start_time"])
+                        new_elapsed = current_elapsed + seek_jump
+                        if duration:
+                            new_elapsed = max(0, min(new_elapsed, duration-1))
+                        # Update the start time to reflect the new position
+                        _voice_now_playing[gid]["start_time"] = time.time() - new_elapsed
+                        _voice_now_playing[gid]["offset"] = new_elapsed
+                        try:
+                            # Replacing the source bumps the generation, so the old
+                            # source's after-callback is ignored.
+                            _start_playback(vc, gid, _make_audio_source(to_play, use_stream, new_elapsed))
+                        except discord.errors.ClientException:
+                            # If we can't create the new source, let the track end normally
+                            pass
+                        continue
+                if events["done"].is_set() or not vc.is_connected():
                     break
-                await asyncio.sleep(0.5)
             t = _progress_tasks.get(gid)
             if t: t.cancel()
             _progress_tasks.pop(gid, None)
             if gid in _voice_now_playing:
                 del _voice_now_playing[gid]
-            if _voice_skip_flag.get(gid, False):
+            if interrupted or not vc.is_connected():
                 break
             if not should_loop:
                 break
-        try:
-            await asyncio.wait_for(vc.disconnect(force=True), timeout=10)
-        except asyncio.TimeoutError:
-            pass
         if not fut.done():
             fut.set_result(None)
     except Exception as e:
@@ -454,16 +592,13 @@ async def _process_audio_item(guild, gid, item):
                 except Exception:
                     pass
             del _voice_now_playing[gid]
-        _voice_skip_flag[gid] = False
         _voice_seek_flag[gid] = 0
+        for name in ("skip", "seek", "stop"):
+            events[name].clear()
         t = _progress_tasks.get(gid)
         if t: t.cancel()
         _progress_tasks.pop(gid, None)
-        try:
-            if not use_stream and file_path.startswith(tempfile.gettempdir()) and os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as ex:
-            print(f"Audio cleanup warning: {ex}")
+        _cleanup_item_file(file_path, use_stream)
 
 async def _update_progress_message(gid):
     while True:
@@ -515,13 +650,7 @@ def skip_audio(voice_channel: discord.VoiceChannel):
     gid = voice_channel.guild.id if voice_channel else None
     if gid is None:
         return False
-    info = _voice_now_playing.get(gid)
-    if info and isinstance(info, dict):
-        vc = info.get("vc")
-        if vc and vc.is_connected():
-            _voice_skip_flag[gid] = True
-            return True
-    return False
+    return skip_audio_by_guild(gid)
 
 def skip_audio_by_guild(guild_id):
     gid = guild_id
@@ -529,7 +658,7 @@ def skip_audio_by_guild(guild_id):
     if info and isinstance(info, dict):
         vc = info.get("vc")
         if vc and vc.is_connected():
-            _voice_skip_flag[gid] = True
+            _get_voice_events(gid)["skip"].set()
             return True
     return False
 
@@ -541,6 +670,7 @@ def seek_audio_by_guild(guild_id, seconds: int):
     now = int(time.time() - info["start_time"]) + (info.get('offset') or 0)
     new_pos = max(0, min(now + seconds, info["duration"] - 1))
     _voice_seek_flag[guild_id] = new_pos - now
+    _get_voice_events(guild_id)["seek"].set()
     return new_pos
 
 # ===== Rotation stop coordination (for commands like /music) =====
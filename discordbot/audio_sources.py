@@ -0,0 +1,314 @@
+"""Custom audio inputs for the voice queue.
+
+Anything queued through `audio_player.play_source` must expose
+`create_source(offset) -> discord.AudioSource` and `close()`. The classes here
+let synthesis start feeding the player before the full clip exists.
+
+Mono PCM16 (what the xAI provider returns) is converted to Discord's 48 kHz
+stereo in process by `PCMAudioSource`, and archived Opus clips are sent as-is
+by `OpusPacketSource`; neither starts an ffmpeg subprocess. NumPy is
+used when installed, otherwise the `array` module and a plain loop.
+"""
+
+import asyncio
+import sys
+import threading
+import wave
+from array import array
+from typing import Callable, Optional
+import discord
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pure-Python resampling fallback
+    np = None  # type: ignore
+
+
+class AudioStreamBuffer:
+    """Thread-safe FIFO of audio bytes filled while a TTS provider is still streaming.
+
+    The producer runs on the event loop (`write`/`finish`); the consumer calls
+    the blocking `read` from the voice player thread (`PCMAudioSource`) or from
+    the ffmpeg stdin writer thread started by FFmpegPCMAudio (MP3). `codec` is
+    "pcm" (s16le mono at `sample_rate`) or "mp3".
+    """
+
+    def __init__(self, codec: str = "pcm", sample_rate: int = 24000, *, prebuffer_ms: int = 100):
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.error: Optional[BaseException] = None
+        self.producer_task: Optional[asyncio.Task] = None
+        self._buf = bytearray()
+        self._total = 0
+        self._finished = False
+        self._closed = False
+        self._cond = threading.Condition()
+        if codec == "pcm":
+            self._prebuffer_bytes = max(1, sample_rate * 2 * prebuffer_ms // 1000)
+        else:
+            # ~48 kbit/s MP3 from edge-tts
+            self._prebuffer_bytes = max(1, 6000 * prebuffer_ms // 1000)
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _signal_ready(self) -> None:
+        if not self._ready.is_set():
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass
+
+    def write(self, data: bytes) -> bool:
+        """Append audio; returns False once the consumer has closed the stream."""
+        with self._cond:
+            if self._closed or self._finished:
+                return False
+            if data:
+                self._buf += data
+                self._total += len(data)
+                self._cond.notify_all()
+            ready = self._total >= self._prebuffer_bytes
+        if ready:
+            self._signal_ready()
+        return True
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self._finished = True
+            if error is not None and self.error is None:
+                self.error = error
+            self._cond.notify_all()
+        self._signal_ready()
+
+    def close(self) -> None:
+        """Consumer side is done (track ended or skipped): drop data and stop the producer."""
+        with self._cond:
+            self._closed = True
+            self._buf.clear()
+            self._cond.notify_all()
+        task = self.producer_task
+        if task is not None and not task.done():
+            try:
+                self._loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass
+        self._signal_ready()
+
+    def read(self, n: int = -1) -> bytes:
+        """Blocking read used by the ffmpeg pipe writer; b"" means end of stream."""
+        with self._cond:
+            while not self._closed and not self._finished and (n < 0 or len(self._buf) < n):
+                self._cond.wait()
+            if self._closed:
+                return b""
+            if n < 0 or n > len(self._buf):
+                n = len(self._buf)
+            data = bytes(self._buf[:n])
+            del self._buf[:n]
+            return data
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first ~prebuffer_ms of audio; False if synthesis produced nothing."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return self._total > 0
+        return self._total > 0 and not self._closed
+
+    def create_source(self, offset: int = 0) -> discord.AudioSource:
+        # Live stream: seeking is not supported, offset is ignored.
+        if self.codec == "pcm":
+            return PCMAudioSource(self.read, self.sample_rate)
+        return discord.FFmpegPCMAudio(self, pipe=True, before_options="-f mp3")
+
+
+DISCORD_RATE = 48000
+# One Discord frame: 20 ms of 48 kHz stereo s16le
+FRAME_BYTES = DISCORD_RATE // 50 * 2 * 2
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+class _LinearResampler:
+    """Streaming linear-interpolation resampler, mono s16 -> 48 kHz stereo s16 bytes."""
+
+    def __init__(self, rate: int):
+        self.step = rate / DISCORD_RATE
+        self.pos = 0.0  # next output position, in input samples from `tail`
+        self.tail: Optional[int] = None  # last input sample of the previous chunk
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = array("h")
+        samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+        if _BIG_ENDIAN:
+            samples.byteswap()
+        if self.tail is not None:
+            samples.insert(0, self.tail)
+        if len(samples) < 2:
+            if samples:
+                self.tail = samples[-1]
+            return b""
+        last = len(samples) - 1
+        if np is not None:
+            out = self._interp_numpy(samples, last)
+        else:
+            out = self._interp_python(samples, last)
+        self.tail = samples[-1]
+        return out
+
+    def _interp_numpy(self, samples: array, last: int) -> bytes:
+        if self.pos > last:
+            # The chunk ends before the next output position: nothing to emit, as in the loop below
+            self.pos -= last
+            return b""
+        src = np.frombuffer(samples, dtype=np.int16).astype(np.float32)
+        count = int((last - self.pos) / self.step) + 1
+        positions = self.pos + self.step * np.arange(count, dtype=np.float64)
+        mono = np.interp(positions, np.arange(last + 1), src)
+        self.pos = float(positions[-1] + self.step - last)
+        stereo = np.repeat(np.clip(np.rint(mono), -32768, 32767).astype("<i2"), 2)
+        return stereo.tobytes()
+
+    def _interp_python(self, samples: array, last: int) -> bytes:
+        mono = array("h")
+        pos, step = self.pos, self.step
+        while pos <= last:
+            i = int(pos)
+            frac = pos - i
+            if frac:
+                mono.append(int(samples[i] + (samples[i + 1] - samples[i]) * frac))
+            else:
+                mono.append(samples[i])
+            pos += step
+        self.pos = pos - last
+        stereo = array("h", bytes(4 * len(mono)))
+        stereo[0::2] = mono
+        stereo[1::2] = mono
+        if _BIG_ENDIAN:
+            stereo.byteswap()
+        return stereo.tobytes()
+
+
+class PCMAudioSource(discord.AudioSource):
+    """Plays mono s16le PCM at `sample_rate` without ffmpeg.
+
+    `read_pcm(n)` returns up to `n` bytes (blocking is fine, it runs on the
+    voice player thread) and b"" at the end of the clip.
+    """
+
+    def __init__(self, read_pcm: Callable[[int], bytes], sample_rate: int,
+                 on_cleanup: Optional[Callable[[], None]] = None):
+        self._read_pcm = read_pcm
+        self._resampler = _LinearResampler(sample_rate)
+        # Input bytes for about one output frame (20 ms)
+        self._chunk = max(2, sample_rate // 50 * 2)
+        self._out = bytearray()
+        self._eof = False
+        self._on_cleanup = on_cleanup
+
+    def is_opus(self) -> bool:
+        return False
+
+    def read(self) -> bytes:
+        while len(self._out) < FRAME_BYTES and not self._eof:
+            pcm = self._read_pcm(self._chunk)
+            if not pcm:
+                self._eof = True
+                break
+            self._out += self._resampler.process(pcm)
+        if not self._out:
+            return b""
+        if len(self._out) < FRAME_BYTES:
+            # Last partial frame of the clip: pad with silence
+            self._out += bytes(FRAME_BYTES - len(self._out))
+        frame = bytes(self._out[:FRAME_BYTES])
+        del self._out[:FRAME_BYTES]
+        return frame
+
+    def cleanup(self) -> None:
+        if self._on_cleanup is not None:
+            callback, self._on_cleanup = self._on_cleanup, None
+            callback()
+
+
+def wav_pcm_source(path: str, offset: float = 0) -> Optional[PCMAudioSource]:
+    """In-process source for a mono 16-bit WAV (rendered TTS clips), or None if the
+    file has another layout and should go through ffmpeg."""
+    try:
+        wf = wave.open(path, "rb")
+    except (OSError, EOFError, wave.Error):
+        return None
+    if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+        wf.close()
+        return None
+    rate = wf.getframerate()
+    if offset and offset > 0:
+        wf.setpos(min(wf.getnframes(), int(offset * rate)))
+    return PCMAudioSource(lambda n: wf.readframes(n // 2), rate, on_cleanup=wf.close)
+
+
+# Opus frames in the archive are 20 ms, like Discord's
+OPUS_FRAMES_PER_SECOND = 50
+
+
+class OpusPacketSource(discord.AudioSource):
+    """Serves pre-encoded Opus packets from a memory-mapped archive (see opus_archive).
+
+    Packets are stored as a 2-byte little-endian length followed by the
+    packet; nothing is decoded or encoded at play time.
+    """
+
+    def __init__(self, data, start: int, end: int):
+        self._data = data
+        self._pos = start
+        self._end = end
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        pos = self._pos
+        if pos + 2 > self._end:
+            return b""
+        size = int.from_bytes(self._data[pos:pos + 2], "little")
+        self._pos = pos + 2 + size
+        return self._data[pos + 2:self._pos]
+
+
+class OpusClip:
+    """One archived clip, queued through `audio_player.play_source`."""
+
+    def __init__(self, name: str, data, start: int, end: int, packets: int):
+        self.name = name
+        self._data = data
+        self._start = start
+        self._end = end
+        self.packets = packets
+
+    @property
+    def duration(self) -> float:
+        return self.packets / OPUS_FRAMES_PER_SECOND
+
+    def create_source(self, offset: int = 0) -> discord.AudioSource:
+        pos = self._start
+        # Seeking walks the length prefixes; no audio is touched
+        for _ in range(int(max(0, offset) * OPUS_FRAMES_PER_SECOND)):
+            if pos + 2 > self._end:
+                break
+            pos += 2 + int.from_bytes(self._data[pos:pos + 2], "little")
+        return OpusPacketSource(self._data, min(pos, self._end), self._end)
+
+    def close(self) -> None:
+        # The archive mapping is shared by every clip
+        pass
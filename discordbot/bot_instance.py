@@ -1,5 +1,5 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import json
 import logging
 import os
@@ -11,48 +11,58 @@ BASE_DIR = Path(__file__).resolve().parent
 # Always load config relative to this file so running with `python -m discordbot.main`
 # from the project root still works.
 config_path = BASE_DIR / "config.json"
-if not config_path.exists():
-    raise FileNotFoundError(
-        f"Config file not found at {config_path}. Ensure discordbot/config.json exists and is readable."
-    )
-try:
-    config_raw = config_path.read_text(encoding="utf-8")
-except Exception as exc:
-    raise RuntimeError(
-        f"Failed to read config file at {config_path}: {exc}"
-    ) from exc
-
-if config_raw.lstrip().startswith("$ANSIBLE_VAULT"):
-    raise RuntimeError(
-        "Config file appears to be Ansible Vault encrypted. "
-        "Decrypt discordbot/config.json before starting the bot."
-    )
-
-try:
-    config = json.loads(config_raw)
-except json.JSONDecodeError as exc:
-    raise RuntimeError(
-        f"Config file is not valid JSON ({config_path}): {exc}"
-    ) from exc
-
-# ---- Multi-token resolution ----
-# Priority order:
-# 1. DISCORD_TOKEN env var (explicit override)
-# 2. COMMAND_PROFILE mapped token in config['tokens'] (if present)
-# 3. Legacy single 'token' field in config.json
 profile = os.getenv("COMMAND_PROFILE")
-tokens_map = config["tokens"]
-selected_token = None
-if os.getenv("DISCORD_TOKEN"):
-    selected_token = os.getenv("DISCORD_TOKEN")
-elif profile and profile in tokens_map and tokens_map.get(profile):
-    selected_token = tokens_map.get(profile)
-else:
-    selected_token = config["token"]
-config["token"] = selected_token
-
-# API key override (xAI only)
-config["xai_api_key"] = os.getenv("XAI_API_KEY") or config.get("xai_api_key")
+
+
+def load_config_file() -> dict:
+    """Read and parse config.json, then apply the token / API key overrides.
+
+    Used once at import and again by config_service on hot reload.
+    """
+    if not config_path.exists():
+        raise FileNotFoundError(
+            f"Config file not found at {config_path}. Ensure discordbot/config.json exists and is readable."
+        )
+    try:
+        config_raw = config_path.read_text(encoding="utf-8")
+    except Exception as exc:
+        raise RuntimeError(
+            f"Failed to read config file at {config_path}: {exc}"
+        ) from exc
+
+    if config_raw.lstrip().startswith("$ANSIBLE_VAULT"):
+        raise RuntimeError(
+            "Config file appears to be Ansible Vault encrypted. "
+            "Decrypt discordbot/config.json before starting the bot."
+        )
+
+    try:
+        cfg = json.loads(config_raw)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError(
+            f"Config file is not valid JSON ({config_path}): {exc}"
+        ) from exc
+
+    # ---- Multi-token resolution ----
+    # Priority order:
+    # 1. DISCORD_TOKEN env var (explicit override)
+    # 2. COMMAND_PROFILE mapped token in config['tokens'] (if present)
+    # 3. Legacy single 'token' field in config.json
+    tokens_map = cfg["tokens"]
+    if os.getenv("DISCORD_TOKEN"):
+        selected_token = os.getenv("DISCORD_TOKEN")
+    elif profile and profile in tokens_map and tokens_map.get(profile):
+        selected_token = tokens_map.get(profile)
+    else:
+        selected_token = cfg["token"]
+    cfg["token"] = selected_token
+
+    # API key override (xAI only)
+    cfg["xai_api_key"] = os.getenv("XAI_API_KEY") or cfg.get("xai_api_key")
+    return cfg
+
+
+config = load_config_file()
 
 # Per-profile logging (so two processes don't fight over same file) — store under package data dir
 profile_safe = (profile or "single").lower()
@@ -102,21 +112,24 @@ intents.guilds = True
 intents.messages = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
-def get_config():
-    return config
 
-try:
-    from .reddit_loader import load_reddit_jokes
-except ImportError:  # script style
-    from reddit_loader import load_reddit_jokes  # type: ignore
-import os
+class Bot(commands.Bot):
+    async def close(self):
+        # Close the Reddit aiohttp session while the loop is still running
+        try:
+            from .reddit_loader import close_session
+        except ImportError:
+            from reddit_loader import close_session  # type: ignore
+        try:
+            await close_session()
+        except Exception as ex:
+            logging.warning("Could not close the Reddit session: %s", ex)
+        await super().close()
 
-@tasks.loop(hours=24)
-async def refresh_reddit_jokes():
-    logging.info("Refreshing Reddit jokes (background)...")
-    await load_reddit_jokes()
-    logging.info("Reddit jokes refreshed.")
+
+bot = Bot(command_prefix="!", intents=intents)
+def get_config():
+    return config
 
 first_ready = True
 
@@ -130,24 +143,13 @@ async def on_ready():
 
     try:
         if first_ready:
-            logging.info("Loading Reddit jokes at startup...")
-            await load_reddit_jokes()
-            logging.info("Reddit jokes loaded.")
-            refresh_reddit_jokes.start()
-
             try:
-                from .commands import setup_all_commands
+                from .startup import run_startup
             except ImportError:
-                from commands import setup_all_commands  # type: ignore
-            logging.info("Setting up command modules (first run)...")
+                from startup import run_startup  # type: ignore
             logging.info("Env COMMAND_MODULES=%s COMMAND_PROFILE=%s", os.getenv("COMMAND_MODULES"), os.getenv("COMMAND_PROFILE"))
-            loaded = await setup_all_commands(bot)
-            if not loaded:
-                logging.error("No command modules loaded! Check import errors above or profile configuration.")
-            logging.info("Syncing slash commands (first run)...")
-            cmds = await bot.tree.sync()
-            logging.info(f"Slash commands synced: {len(cmds)} cmds (expected ~{len(loaded)})")
-
+            # Commands first; Reddit jokes and other data sources warm up in the background
+            await run_startup(bot)
             first_ready = False
 
         # Show normal status after all is ready — differentiate bots
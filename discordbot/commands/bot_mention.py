@@ -2,7 +2,6 @@ import discord
 from discord.ext import commands
 import asyncio
 import logging
-import json
 import os
 import re
 import tempfile
@@ -13,25 +12,17 @@ try:
 except ImportError:  # script fallback
     from gpt_util import run_gpt  # type: ignore
 try:
-    from ..tts_util import run_tts  # type: ignore
-    from ..audio_player import play_audio  # type: ignore
+    from ..tts_util import run_tts_async, open_tts_stream, tts_streaming_enabled  # type: ignore
+    from ..audio_player import play_audio, play_source  # type: ignore
     from ..guild_settings import get_tts_instructions  # type: ignore
+    from ..config_service import prompt, mention_history_ttl_seconds  # type: ignore
 except ImportError:  # script fallback
-    from tts_util import run_tts  # type: ignore
-    from audio_player import play_audio  # type: ignore
+    from tts_util import run_tts_async, open_tts_stream, tts_streaming_enabled  # type: ignore
+    from audio_player import play_audio, play_source  # type: ignore
     from guild_settings import get_tts_instructions  # type: ignore
-
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.json'))
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-# Load prompts from config (no fallbacks)
-prompts = config["prompts"]
-bot_system_prompt = prompts["bot_system_prompt"]
-short_reply_suffix = prompts["short_reply_suffix"]
+    from config_service import prompt, mention_history_ttl_seconds  # type: ignore
 
 MAX_HISTORY = 15
-HISTORY_TTL_SECONDS = int(config["mention_history_ttl_seconds"])
 
 
 class _MessageInteraction:
@@ -94,8 +85,9 @@ class BotMentionCog(commands.Cog):
         history = list(self.channel_histories[channel.id])
 
         # Dynamically format the prompt with the bot's display name
-        base_system_prompt = bot_system_prompt.format(bot_name=bot_display_name)
-        dynamic_system_prompt = base_system_prompt + short_reply_suffix
+        # Prompts come from config without fallbacks (KeyError if missing)
+        base_system_prompt = prompt("bot_system_prompt").format(bot_name=bot_display_name)
+        dynamic_system_prompt = base_system_prompt + prompt("short_reply_suffix")
 
 
         # If there are images, avoid duplicating the just-appended user text by removing it from history
@@ -136,20 +128,32 @@ class BotMentionCog(commands.Cog):
         if not author_voice or not author_voice.channel:
             return
         voice_channel = author_voice.channel
-        loop = asyncio.get_running_loop()
+        interaction = _MessageInteraction(message.guild, message.channel)
+        instructions = get_tts_instructions(message.guild)
+        if tts_streaming_enabled():
+            # Start speaking on the first audio deltas instead of waiting for the whole clip
+            stream = open_tts_stream(reply_text, instructions)
+            try:
+                if not await stream.wait_ready(timeout=20):
+                    stream.close()
+                    logging.warning("TTS generation failed for mention reply.")
+                    return
+                await play_source(interaction, stream, voice_channel)
+            except Exception as ex:
+                stream.close()
+                logging.error("TTS playback failed for mention reply: %s", ex)
+            return
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
             filename = tmp.name
         try:
-            instructions = get_tts_instructions(message.guild)
             success_tuple = await asyncio.wait_for(
-                loop.run_in_executor(None, run_tts, reply_text, filename, instructions),
+                run_tts_async(reply_text, filename, instructions),
                 timeout=20
             )
             success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
             if not success:
                 logging.warning("TTS generation failed for mention reply.")
                 return
-            interaction = _MessageInteraction(message.guild, message.channel)
             await play_audio(interaction, filename, voice_channel)
         except Exception as ex:
             logging.error("TTS playback failed for mention reply: %s", ex)
@@ -168,7 +172,7 @@ class BotMentionCog(commands.Cog):
             active_until = None
 
         if self.bot.user in message.mentions:
-            self.channel_active_until[channel_id] = now + HISTORY_TTL_SECONDS
+            self.channel_active_until[channel_id] = now + mention_history_ttl_seconds()
             # Get the current name or nickname of the bot in the context server
             if message.guild:
                 me = message.guild.get_member(self.bot.user.id)
@@ -7,15 +7,19 @@ import asyncio
 import logging
 from pathlib import Path
 try:
-    from ..tts_util import run_tts
-    from ..audio_player import play_audio, get_voice_channel
+    from ..tts_util import run_tts_async
+    from ..audio_player import play_audio, play_source, get_voice_channel
     from ..history import log_command
-    from ..reddit_loader import get_reddit_jokes
+    from ..reddit_loader import pick_reddit_joke
+    from ..startup import is_ready, warming_up_message
+    from ..opus_archive import get_opus_clip
 except ImportError:  # fallback when run as script from project root
-    from tts_util import run_tts  # type: ignore
-    from audio_player import play_audio, get_voice_channel  # type: ignore
+    from tts_util import run_tts_async  # type: ignore
+    from audio_player import play_audio, play_source, get_voice_channel  # type: ignore
     from history import log_command  # type: ignore
-    from reddit_loader import get_reddit_jokes  # type: ignore
+    from reddit_loader import pick_reddit_joke  # type: ignore
+    from startup import is_ready, warming_up_message  # type: ignore
+    from opus_archive import get_opus_clip  # type: ignore
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 AUDIO_DIR = BASE_DIR / "Audio"
@@ -27,9 +31,13 @@ def _is_missing_voice_backend(exc: Exception) -> bool:
     return isinstance(exc, RuntimeError) and VOICE_BACKEND_MISSING in str(exc)
 
 
-async def _play_audio_safe(interaction: discord.Interaction, audio_path: str, vc_channel: discord.VoiceChannel):
+async def _play_audio_safe(interaction: discord.Interaction, audio, vc_channel: discord.VoiceChannel):
+    # `audio` is a file path or an archived Opus clip
     try:
-        await play_audio(interaction, audio_path, vc_channel)
+        if isinstance(audio, str):
+            await play_audio(interaction, audio, vc_channel)
+        else:
+            await play_source(interaction, audio, vc_channel, duration=audio.duration)
     except Exception as exc:
         if _is_missing_voice_backend(exc):
             try:
@@ -48,29 +56,23 @@ async def setup(bot):
     async def joke(interaction: discord.Interaction, voice_channel: discord.VoiceChannel = None):
         await interaction.response.defer(thinking=True, ephemeral=True)  # Defer immediately
         log_command(interaction.user, "joke", {"voice_channel": str(voice_channel) if voice_channel else None}, guild=interaction.guild)
-        reddit_jokes_by_sub = get_reddit_jokes()
-        if not reddit_jokes_by_sub or not any(len(v) > 0 for v in reddit_jokes_by_sub.values()):
+        joke_text = pick_reddit_joke(interaction.guild.id if interaction.guild else None)
+        if not joke_text:
+            if not is_ready("reddit"):
+                await interaction.followup.send(warming_up_message("reddit"), ephemeral=True)
+                return
             await interaction.followup.send("Aucune blague pour le moment, réessaye plus tard.", ephemeral=True)
             return
-        import math
-        sub = random.choice([s for s in reddit_jokes_by_sub if reddit_jokes_by_sub[s]])
-        posts = reddit_jokes_by_sub[sub]
-        bias = 0.02
-        weights = [math.exp(-bias * i) for i in range(len(posts))]
-        idx = random.choices(range(len(posts)), weights=[w / sum(weights) for w in weights], k=1)[0]
-        post = posts[idx]["data"]
-        joke_text = f"{post['title']}. {post['selftext']}".strip()
         vc_channel = get_voice_channel(interaction, voice_channel)
         if not vc_channel:
             await interaction.followup.send("Vous devez être dans un salon vocal, ou préciser un vocal !", ephemeral=True)
             return
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
             filename = tmp.name
-        loop = asyncio.get_running_loop()
         try:
             success_tuple = await asyncio.wait_for(
-                loop.run_in_executor(None, run_tts, joke_text, filename,
-                                     "Read this joke with a comic tone, as if you are a stand-up comedian."),
+                run_tts_async(joke_text, filename,
+                              "Read this joke with a comic tone, as if you are a stand-up comedian."),
                 timeout=20
             )
             success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
@@ -94,7 +96,9 @@ async def setup(bot):
             await interaction.followup.send("Vous devez être dans un salon vocal, ou préciser un vocal !", ephemeral=True)
             return
         try:
-            asyncio.create_task(_play_audio_safe(interaction, os.path.join(str(AUDIO_DIR), file), vc_channel))
+            # Pre-encoded Opus when the archive is built, else ffmpeg decodes the MP3
+            audio = get_opus_clip(file) or os.path.join(str(AUDIO_DIR), file)
+            asyncio.create_task(_play_audio_safe(interaction, audio, vc_channel))
             await interaction.followup.send("Lecture audio lancée dans le salon vocal.", ephemeral=True)
         except Exception:
             await interaction.followup.send("Erreur pendant la lecture !", ephemeral=True)
@@ -1,111 +1,151 @@
 import discord
 from discord import app_commands
 import asyncio
-import yt_dlp
 import random
-import json
-from pathlib import Path
 try:
-    from ..audio_player import play_ytdlp_stream, get_voice_channel, consume_rotation_stop, skip_audio_by_guild  # type: ignore
+    from ..audio_player import play_ytdlp_stream, get_voice_channel, consume_rotation_stop, skip_audio_by_guild, prewarm_ytdlp_stream  # type: ignore
     from ..history import log_command  # type: ignore
+    from ..ytdlp_resolver import get_info as ytdlp_get_info  # type: ignore
+    from ..music_index import MUSIC_SOURCES_PATH, load_music_sources, iter_category_videos  # type: ignore
 except ImportError:  # script fallback
-    from audio_player import play_ytdlp_stream, get_voice_channel, consume_rotation_stop, skip_audio_by_guild  # type: ignore
+    from audio_player import play_ytdlp_stream, get_voice_channel, consume_rotation_stop, skip_audio_by_guild, prewarm_ytdlp_stream  # type: ignore
     from history import log_command  # type: ignore
-from concurrent.futures import ProcessPoolExecutor
+    from ytdlp_resolver import get_info as ytdlp_get_info  # type: ignore
+    from music_index import MUSIC_SOURCES_PATH, load_music_sources, iter_category_videos  # type: ignore
 
-YTDLP_EXECUTOR = ProcessPoolExecutor(max_workers=6)
+# Per-guild stop flags for the music rotation task (internal control)
+_MUSIC_ROTATION_STOP_FLAGS = {}
 
-YTDLP_CLIENT_ORDER = ["android", "ios", "web"]
 
-# Path to the JSON file defining categories and URLs
-MUSIC_SOURCES_PATH = (Path(__file__).resolve().parent.parent / "music_sources.json")
+async def _stop_previous_rotation(gid):
+    # Stop any existing rotation in this guild
+    if _MUSIC_ROTATION_STOP_FLAGS.get(gid) is False:
+        _MUSIC_ROTATION_STOP_FLAGS[gid] = True
+        skip_audio_by_guild(gid)
+        await asyncio.sleep(0.5)
+    _MUSIC_ROTATION_STOP_FLAGS[gid] = False
 
 
-def load_music_sources():
-    try:
-        with open(MUSIC_SOURCES_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            return {}
-        normalized = {}
-        for k, v in data.items():
-            if not isinstance(k, str) or not isinstance(v, list):
-                continue
-            urls = [u.strip() for u in v if isinstance(u, str) and u.strip()]
-            normalized[k] = urls
-        return normalized
-    except FileNotFoundError:
-        return {}
-    except Exception:
-        return {}
+class _ShuffledRotation:
+    """Shuffled play order that keeps accepting URLs while sources are still expanding.
 
-# Per-guild stop flags for the music rotation task (internal control)
-_MUSIC_ROTATION_STOP_FLAGS = {}
+    New URLs are inserted at a random position of the remaining order (which
+    keeps the permutation uniform) and never twice in the same cycle. A new
+    cycle is only reshuffled once every source has been expanded.
+    """
 
+    def __init__(self):
+        self.known = []
+        self.loading = True
+        self._seen = set()
+        self._upcoming = []
+        self._changed = asyncio.Event()
 
-def _make_ydl_opts(client: str):
-    return {
-        'quiet': True,
-        'no_warnings': True,
-        'noplaylist': True,
-        'format': 'bestaudio/best',
-        'extractor_args': {
-            # Workaround for YouTube SABR streaming blocking some web formats
-            'youtube': {
-                'player_client': [client]
-            }
-        },
-    }
+    def add(self, urls):
+        for url in urls:
+            if url in self._seen:
+                continue
+            self._seen.add(url)
+            self.known.append(url)
+            self._upcoming.insert(random.randint(0, len(self._upcoming)), url)
+        self._changed.set()
+
+    def finish_loading(self):
+        self.loading = False
+        self._changed.set()
+
+    async def next(self, last_url=None):
+        """Next URL to play, or None once loading ended without any valid URL."""
+        while True:
+            if self._upcoming:
+                return self._upcoming.pop()
+            if not self.loading:
+                if not self.known:
+                    return None
+                order = self.known[:]
+                random.shuffle(order)
+                # Avoid repeating the same URL across boundaries (pop() takes the end)
+                if last_url and len(order) > 1 and order[-1] == last_url:
+                    order[0], order[-1] = order[-1], order[0]
+                self._upcoming = order
+                continue
+            self._changed.clear()
+            await self._changed.wait()
 
 
-def _make_playlist_opts(client: str):
-    # Options to expand playlist entries without downloading media
-    base = _make_ydl_opts(client).copy()
-    base['noplaylist'] = False
-    base['extract_flat'] = 'in_playlist'
-    base['skip_download'] = True
-    return base
+async def _resolve_next(rotation, last_url):
+    """(url, info) for the next track; info is None when extraction failed, url None when exhausted."""
+    url = await rotation.next(last_url)
+    if url is None:
+        return None, None
+    try:
+        return url, await ytdlp_get_info(url)
+    except Exception:
+        return url, None
 
 
-def ytdlp_get_info(url):
-    last_exc = None
-    for client in YTDLP_CLIENT_ORDER:
-        try:
-            with yt_dlp.YoutubeDL(_make_ydl_opts(client)) as ydl:
-                info = ydl.extract_info(url, download=False)
-                info['__client'] = client
-                return info
-        except Exception as exc:
-            last_exc = exc
-            continue
-    raise last_exc
+async def _prefetch_next(gid, rotation, last_url):
+    # Runs while the current track plays so the next one is ready when it ends
+    url, info = await _resolve_next(rotation, last_url)
+    if info is not None:
+        prewarm_ytdlp_stream(gid, info)
+    return url, info
 
 
-def ytdlp_expand_to_videos(url):
-    """Return a list of YouTube video webpage URLs for a given video or playlist URL."""
-    last_exc = None
-    for client in YTDLP_CLIENT_ORDER:
+async def _rotation_task(interaction, gid, category, vc_channel):
+    rotation = _ShuffledRotation()
+
+    async def load_sources():
+        # Feed the rotation as each source is expanded so the first track starts early
         try:
-            with yt_dlp.YoutubeDL(_make_playlist_opts(client)) as ydl:
-                info = ydl.extract_info(url, download=False)
-                # If it's a playlist, info will typically have 'entries'
-                if isinstance(info, dict) and info.get('entries'):
-                    out = []
-                    for e in info['entries']:
-                        wp = e.get('webpage_url') or e.get('url')
-                        if wp and not str(wp).startswith('http'):
-                            wp = f"https://www.youtube.com/watch?v={wp}"
-                        if wp:
-                            out.append(wp)
-                    if out:
-                        return out
-                # Single video fallback
-                wp = info.get('webpage_url', url) if isinstance(info, dict) else url
-                return [wp]
-        except Exception as exc:
-            last_exc = exc
-            continue
-    raise last_exc
+            async for videos in iter_category_videos(category):
+                rotation.add(videos)
+        finally:
+            rotation.finish_loading()
+
+    loader = asyncio.create_task(load_sources())
+    pending = asyncio.create_task(_resolve_next(rotation, None))
+    first_announce = True
+    try:
+        while not _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
+            url, info = await pending
+            pending = None
+            if url is None:
+                await interaction.followup.send("Aucune source valide trouvée pour cette catégorie.", ephemeral=True)
+                break
+            if _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
+                break
+            if info is None:
+                pending = asyncio.create_task(_resolve_next(rotation, url))
+                continue
+            duration = info.get("duration")
+            video_title = info.get("title", "Musique")
+            video_url = info.get("webpage_url", url)
+            is_live = bool(info.get("is_live")) or info.get("live_status") == "is_live"
+            pending = asyncio.create_task(_prefetch_next(gid, rotation, url))
+            try:
+                await play_ytdlp_stream(
+                    interaction,
+                    info,
+                    vc_channel,
+                    duration=duration,
+                    title=video_title,
+                    video_url=video_url,
+                    announce_message=first_announce,
+                    loop=False,
+                    is_live=is_live,
+                )
+            except Exception:
+                pass
+            first_announce = False
+            # Si le bouton Stop du player a été pressé, sort de la rotation
+            if consume_rotation_stop(gid):
+                break
+    finally:
+        if pending is not None:
+            pending.cancel()
+        loader.cancel()
+        _MUSIC_ROTATION_STOP_FLAGS[gid] = True
 
 
 async def setup(bot):
@@ -129,7 +169,6 @@ async def setup(bot):
             guild=interaction.guild
         )
         await interaction.response.defer(thinking=True, ephemeral=True)
-        loop_async = asyncio.get_running_loop()
         vc_channel = get_voice_channel(interaction, voice_channel)
         if not vc_channel:
             await interaction.followup.send("Vous devez être dans un salon vocal ou en préciser un.", ephemeral=True)
@@ -172,74 +211,12 @@ async def setup(bot):
                             await inter.followup.send("Aucune source configurée pour cette catégorie.", ephemeral=True)
                             return
                         gid = inter.guild.id if inter.guild else 0
-                        if _MUSIC_ROTATION_STOP_FLAGS.get(gid) is False:
-                            _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                            skip_audio_by_guild(gid)
-                            await asyncio.sleep(0.5)
-                        _MUSIC_ROTATION_STOP_FLAGS[gid] = False
+                        await _stop_previous_rotation(gid)
                         await inter.followup.send(
                             f"Lecture de musique '{cat_key.replace('_',' ')}' démarrée",
                             ephemeral=True,
                         )
-                        loop_async_local = asyncio.get_running_loop()
-
-                        async def rotation_task():
-                            expanded = []
-                            for src in sources:
-                                try:
-                                    lst = await loop_async_local.run_in_executor(YTDLP_EXECUTOR, ytdlp_expand_to_videos, src)
-                                    expanded.extend(lst)
-                                except Exception:
-                                    continue
-                            seen = set()
-                            expanded = [x for x in expanded if not (x in seen or seen.add(x))]
-                            if not expanded:
-                                await inter.followup.send("Aucune source valide trouvée pour cette catégorie.", ephemeral=True)
-                                _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                                return
-                            last_url = None
-                            first_announce = True
-                            while not _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
-                                order = expanded[:]
-                                random.shuffle(order)
-                                if last_url and len(order) > 1 and order[0] == last_url:
-                                    for i in range(1, len(order)):
-                                        if order[i] != last_url:
-                                            order[0], order[i] = order[i], order[0]
-                                            break
-                                for url in order:
-                                    if _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
-                                        break
-                                    try:
-                                        info = await loop_async_local.run_in_executor(YTDLP_EXECUTOR, ytdlp_get_info, url)
-                                    except Exception:
-                                        last_url = url
-                                        continue
-                                    duration = info.get("duration")
-                                    video_title = info.get("title", "Musique")
-                                    video_url = info.get("webpage_url", url)
-                                    is_live = bool(info.get("is_live")) or info.get("live_status") == "is_live"
-                                    try:
-                                        await play_ytdlp_stream(
-                                            inter,
-                                            info,
-                                            vc_channel,
-                                            duration=duration,
-                                            title=video_title,
-                                            video_url=video_url,
-                                            announce_message=first_announce,
-                                            loop=False,
-                                            is_live=is_live,
-                                        )
-                                    except Exception:
-                                        pass
-                                    first_announce = False
-                                    last_url = url
-                                    if consume_rotation_stop(gid):
-                                        _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                                        break
-                            _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                        asyncio.create_task(rotation_task())
+                        asyncio.create_task(_rotation_task(inter, gid, cat_key, vc_channel))
                         self.stop()
 
                     self.confirm.callback = on_confirm
@@ -259,12 +236,7 @@ async def setup(bot):
             return
 
         gid = interaction.guild.id if interaction.guild else 0
-        # Stop any existing rotation in this guild
-        if _MUSIC_ROTATION_STOP_FLAGS.get(gid) is False:
-            _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-            skip_audio_by_guild(gid)
-            await asyncio.sleep(0.5)
-        _MUSIC_ROTATION_STOP_FLAGS[gid] = False
+        await _stop_previous_rotation(gid)
 
         # Accusé de réception minimal; l'annonce du player gère les boutons Stop/Skip
         cat_display = (cat or "").replace('_', ' ') or "(non spécifiée)"
@@ -272,68 +244,4 @@ async def setup(bot):
             f"Lecture de musique '{cat_display}' démarrée — regardez l'annonce du player dans le salon.",
             ephemeral=True,
         )
-
-        async def rotation_task():
-            # Expand all sources into a flat list of video URLs
-            expanded = []
-            for src in sources:
-                try:
-                    lst = await loop_async.run_in_executor(YTDLP_EXECUTOR, ytdlp_expand_to_videos, src)
-                    expanded.extend(lst)
-                except Exception:
-                    continue
-            # Deduplicate preserving order
-            seen = set()
-            expanded = [x for x in expanded if not (x in seen or seen.add(x))]
-            if not expanded:
-                await interaction.followup.send("Aucune source valide trouvée pour cette catégorie.", ephemeral=True)
-                _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                return
-
-            last_url = None
-            first_announce = True
-            while not _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
-                order = expanded[:]
-                random.shuffle(order)
-                # Avoid repeating the same URL across boundaries
-                if last_url and len(order) > 1 and order[0] == last_url:
-                    for i in range(1, len(order)):
-                        if order[i] != last_url:
-                            order[0], order[i] = order[i], order[0]
-                            break
-                for url in order:
-                    if _MUSIC_ROTATION_STOP_FLAGS.get(gid, False):
-                        break
-                    try:
-                        info = await loop_async.run_in_executor(YTDLP_EXECUTOR, ytdlp_get_info, url)
-                    except Exception:
-                        last_url = url
-                        continue
-                    duration = info.get("duration")
-                    video_title = info.get("title", "Musique")
-                    video_url = info.get("webpage_url", url)
-                    is_live = bool(info.get("is_live")) or info.get("live_status") == "is_live"
-                    try:
-                        await play_ytdlp_stream(
-                            interaction,
-                            info,
-                            vc_channel,
-                            duration=duration,
-                            title=video_title,
-                            video_url=video_url,
-                            announce_message=first_announce,
-                            loop=False,
-                            is_live=is_live,
-                        )
-                    except Exception:
-                        pass
-                    first_announce = False
-                    last_url = url
-                    # Si le bouton Stop du player a été pressé, sort de la rotation
-                    if consume_rotation_stop(gid):
-                        _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-                        break
-            _MUSIC_ROTATION_STOP_FLAGS[gid] = True
-
-        asyncio.create_task(rotation_task())
-
+        asyncio.create_task(_rotation_task(interaction, gid, cat, vc_channel))
@@ -3,33 +3,22 @@ from discord import app_commands
 import tempfile
 import asyncio
 import os
-import json
 import logging
 try:
     from ..gpt_util import run_gpt  # type: ignore
-    from ..tts_util import run_tts  # type: ignore
+    from ..tts_util import run_tts_async  # type: ignore
     from ..audio_player import play_audio, get_voice_channel, skip_audio_by_guild  # type: ignore
     from ..history import log_command  # type: ignore
     from ..guild_settings import get_tts_instructions_for  # type: ignore
+    from ..config_service import prompt, intensity_labels, tts_default_instructions  # type: ignore
 except ImportError:  # Script fallback
     from gpt_util import run_gpt  # type: ignore
-    from tts_util import run_tts  # type: ignore
+    from tts_util import run_tts_async  # type: ignore
     from audio_player import play_audio, get_voice_channel, skip_audio_by_guild  # type: ignore
     from history import log_command  # type: ignore
     from guild_settings import get_tts_instructions_for  # type: ignore
+    from config_service import prompt, intensity_labels, tts_default_instructions  # type: ignore
 
-# Load config for prompts
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.json'))
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-prompts = config["prompts"]
-roast_system_prompt = prompts["roast_system_prompt"]
-roast_tts_fallback = (
-    config["tts_default_instructions"]
-)
-_raw_roast_intensity = config["intensity_labels"]["roast"]
-roast_intensity_labels = {int(key): value for key, value in _raw_roast_intensity.items()}
 VOICE_BACKEND_MISSING = "davey library needed in order to use voice"
 
 
@@ -249,7 +238,8 @@ async def do_roast(interaction, cible_id, intensite, details, voice_channel: dis
         await interaction.followup.send("Impossible de trouver la cible dans ce serveur.", ephemeral=True)
         return
     intensite = max(1, min(3, int(intensite)))
-    noms_intensite = roast_intensity_labels
+    noms_intensite = intensity_labels("roast")
+    system_prompt = prompt("roast_system_prompt")
     username = cible.display_name
     ajout_details = ""
     if details:
@@ -265,7 +255,7 @@ async def do_roast(interaction, cible_id, intensite, details, voice_channel: dis
     try:
         texte = await asyncio.wait_for(
             loop.run_in_executor(
-                None, lambda: run_gpt(prompt_gpt, roast_system_prompt, 250, category="roast")
+                None, lambda: run_gpt(prompt_gpt, system_prompt, 250, category="roast")
             ),
             timeout=18
         )
@@ -293,12 +283,12 @@ async def do_roast(interaction, cible_id, intensite, details, voice_channel: dis
     # Vocal
     vc_channel = get_voice_channel(interaction, voice_channel)
     if vc_channel:
-        instructions = get_tts_instructions_for(interaction.guild, "roast", roast_tts_fallback)
+        instructions = get_tts_instructions_for(interaction.guild, "roast", tts_default_instructions())
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
             filename = tmp.name
         try:
             success_tuple = await asyncio.wait_for(
-                loop.run_in_executor(None, run_tts, tts_text, filename, instructions),
+                run_tts_async(tts_text, filename, instructions),
                 timeout=20
             )
             success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
@@ -3,12 +3,12 @@ import discord
 from discord import app_commands
 try:
     from ..audio_player import get_voice_channel, play_audio
-    from ..tts_util import run_tts
+    from ..tts_util import run_tts_async
     from ..history import log_command
     from ..guild_settings import get_tts_instructions_for
 except ImportError:  # script fallback
     from audio_player import get_voice_channel, play_audio  # type: ignore
-    from tts_util import run_tts  # type: ignore
+    from tts_util import run_tts_async  # type: ignore
     from history import log_command  # type: ignore
     from guild_settings import get_tts_instructions_for  # type: ignore
 
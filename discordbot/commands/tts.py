@@ -2,26 +2,20 @@ import discord
 from discord import app_commands
 import tempfile
 import asyncio
-import json
-import os
 import logging
 try:
-    from ..tts_util import run_tts
-    from ..audio_player import play_audio, get_voice_channel, skip_audio
+    from ..tts_util import run_tts_async, open_tts_stream, tts_streaming_enabled
+    from ..audio_player import play_audio, play_source, get_voice_channel, skip_audio
     from ..history import log_command
     from ..guild_settings import get_tts_instructions_for
+    from ..config_service import tts_default_instructions
 except ImportError:  # script fallback
-    from tts_util import run_tts  # type: ignore
-    from audio_player import play_audio, get_voice_channel, skip_audio  # type: ignore
+    from tts_util import run_tts_async, open_tts_stream, tts_streaming_enabled  # type: ignore
+    from audio_player import play_audio, play_source, get_voice_channel, skip_audio  # type: ignore
     from history import log_command  # type: ignore
     from guild_settings import get_tts_instructions_for  # type: ignore
+    from config_service import tts_default_instructions  # type: ignore
 
-# Load config for TTS instructions
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.json'))
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-say_vc_tts_fallback = config["tts_default_instructions"]
 VOICE_BACKEND_MISSING = "davey library needed in order to use voice"
 
 
@@ -29,9 +23,12 @@ def _is_missing_voice_backend(exc: Exception) -> bool:
     return isinstance(exc, RuntimeError) and VOICE_BACKEND_MISSING in str(exc)
 
 
-async def _play_audio_safe(interaction: discord.Interaction, filename: str, vc_channel: discord.VoiceChannel):
+async def _play_audio_safe(interaction: discord.Interaction, audio, vc_channel: discord.VoiceChannel):
     try:
-        await play_audio(interaction, filename, vc_channel)
+        if isinstance(audio, str):
+            await play_audio(interaction, audio, vc_channel)
+        else:
+            await play_source(interaction, audio, vc_channel)
     except Exception as exc:
         if _is_missing_voice_backend(exc):
             try:
@@ -45,6 +42,30 @@ async def _play_audio_safe(interaction: discord.Interaction, filename: str, vc_c
         logging.exception("Background TTS playback failed: %s", exc)
 
 
+async def _synthesize_for_vc(text: str, style: str):
+    """Return something playable for `text`, or None if synthesis failed.
+
+    In streaming mode this is the live TTS buffer, ready as soon as the first
+    ~100 ms of audio arrived; otherwise the rendered temp file.
+    """
+    if tts_streaming_enabled():
+        stream = open_tts_stream(text, style)
+        if await stream.wait_ready(timeout=20):
+            return stream
+        stream.close()
+        return None
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        filename = tmp.name
+    success_tuple = await asyncio.wait_for(
+        run_tts_async(text, filename, style),
+        timeout=20
+    )
+    success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
+    if not success:
+        return None
+    return filename
+
+
 def build_safe_tts_embed(message: str, instructions: str, display_name: str):
     max_overall = 6000
     max_title = 256
@@ -116,20 +137,13 @@ class SayVCModal(discord.ui.Modal, title="Lire un message dans un salon vocal"):
             )
             return
         await interaction.response.defer(thinking=True, ephemeral=False)
-        loop = asyncio.get_running_loop()
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            filename = tmp.name
         try:
-            style = instr or get_tts_instructions_for(interaction.guild, "say_vc", say_vc_tts_fallback)
-            success_tuple = await asyncio.wait_for(
-                loop.run_in_executor(None, run_tts, msg, filename, style),
-                timeout=20
-            )
-            success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
-            if not success:
+            style = instr or get_tts_instructions_for(interaction.guild, "say_vc", tts_default_instructions())
+            audio = await _synthesize_for_vc(msg, style)
+            if audio is None:
                 await interaction.followup.send("Erreur lors de la génération de la synthèse vocale.", ephemeral=True)
                 return
-            asyncio.create_task(_play_audio_safe(interaction, filename, vc_channel))
+            asyncio.create_task(_play_audio_safe(interaction, audio, vc_channel))
             embed = build_safe_tts_embed(msg, instr, interaction.user.display_name)
             await interaction.followup.send(embed=embed, ephemeral=False)
         except Exception as exc:
@@ -176,20 +190,13 @@ async def setup(bot):
             )
             return
         await interaction.response.defer(thinking=True, ephemeral=False)
-        loop = asyncio.get_running_loop()
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            filename = tmp.name
         try:
-            style = instr or get_tts_instructions_for(interaction.guild, "say_vc", say_vc_tts_fallback)
-            success_tuple = await asyncio.wait_for(
-                loop.run_in_executor(None, run_tts, msg, filename, style),
-                timeout=20
-            )
-            success = success_tuple[0] if isinstance(success_tuple, tuple) else success_tuple
-            if not success:
+            style = instr or get_tts_instructions_for(interaction.guild, "say_vc", tts_default_instructions())
+            audio = await _synthesize_for_vc(msg, style)
+            if audio is None:
                 await interaction.followup.send("Erreur lors de la génération de la synthèse vocale.", ephemeral=True)
                 return
-            asyncio.create_task(_play_audio_safe(interaction, filename, vc_channel))
+            asyncio.create_task(_play_audio_safe(interaction, audio, vc_channel))
             embed = build_safe_tts_embed(msg, instr, interaction.user.display_name)
             await interaction.followup.send(embed=embed, ephemeral=False)
         except Exception as exc:
@@ -1,10 +1,11 @@
+import asyncio
 import discord
 from discord import app_commands
 try:
-    from ..history import log_command, get_recent_history
+    from ..history import log_command, recent_for_guild
     from ..audio_player import skip_audio_by_guild
 except ImportError:  # script fallback
-    from history import log_command, get_recent_history  # type: ignore
+    from history import log_command, recent_for_guild  # type: ignore
     from audio_player import skip_audio_by_guild  # type: ignore
 
 async def setup(bot):
@@ -35,8 +36,8 @@ async def setup(bot):
         if gid is None:
             await interaction.followup.send("Cette commande doit être utilisée dans un serveur.", ephemeral=True)
             return
-        all_items = get_recent_history(1000)
-        items = [e for e in reversed(all_items) if e.get("guild_id") == gid]
+        loop = asyncio.get_running_loop()
+        items = await loop.run_in_executor(None, recent_for_guild, gid, 15)
         if not items:
             await interaction.followup.send("Aucune commande récente sur ce serveur.", ephemeral=True)
             return
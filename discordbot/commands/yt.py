@@ -1,61 +1,14 @@
 import discord
 from discord import app_commands
 import asyncio
-import yt_dlp
 try:
     from ..audio_player import play_audio, play_ytdlp_stream, get_voice_channel, skip_audio_by_guild
     from ..history import log_command
+    from ..ytdlp_resolver import get_info as ytdlp_get_info, search as ytdlp_search
 except ImportError:  # script fallback
     from audio_player import play_audio, play_ytdlp_stream, get_voice_channel, skip_audio_by_guild  # type: ignore
     from history import log_command  # type: ignore
-from concurrent.futures import ProcessPoolExecutor
-
-YTDLP_EXECUTOR = ProcessPoolExecutor(max_workers=6)
-
-YTDLP_CLIENT_ORDER = ["android", "ios", "web"]
-
-def _make_ydl_opts(client: str):
-    return {
-        'quiet': True,
-        'no_warnings': True,
-        'noplaylist': True,
-        'format': 'bestaudio/best',
-        'extractor_args': {
-            # Workaround for YouTube SABR streaming blocking some web formats
-            'youtube': {
-                'player_client': [client]
-            }
-        },
-    }
-
-
-def ytdlp_get_info(url):
-    last_exc = None
-    for client in YTDLP_CLIENT_ORDER:
-        try:
-            with yt_dlp.YoutubeDL(_make_ydl_opts(client)) as ydl:
-                info = ydl.extract_info(url, download=False)
-                info['__client'] = client
-                return info
-        except Exception as exc:
-            last_exc = exc
-            continue
-    # If all attempts failed, raise the last exception
-    raise last_exc
-
-
-def ytdlp_search(query):
-    last_exc = None
-    for client in YTDLP_CLIENT_ORDER:
-        try:
-            with yt_dlp.YoutubeDL(_make_ydl_opts(client)) as ydl:
-                res = ydl.extract_info(f"ytsearch3:{query}", download=False)
-                entries = res.get('entries') if isinstance(res, dict) else res
-                return entries
-        except Exception as exc:
-            last_exc = exc
-            continue
-    raise last_exc
+    from ytdlp_resolver import get_info as ytdlp_get_info, search as ytdlp_search  # type: ignore
 
 class StopPlaybackView(discord.ui.View):
     def __init__(self, guild_id: int, initiator_id: int, *, timeout=900):
@@ -143,9 +96,8 @@ async def setup(bot):
         if not vc_channel:
             await interaction.followup.send("Vous devez être dans un salon vocal ou en préciser un.", ephemeral=True)
             return
-        loop_async = asyncio.get_running_loop()
         try:
-            info = await loop_async.run_in_executor(YTDLP_EXECUTOR, ytdlp_get_info, url)
+            info = await ytdlp_get_info(url)
         except Exception as exc:
             await interaction.followup.send(f"Erreur lors de la récupération d'info : {exc}", ephemeral=True)
             return
@@ -190,9 +142,8 @@ async def setup(bot):
     ):
         async def on_complete(inter: discord.Interaction, search_query: str):
             await inter.response.defer(thinking=True, ephemeral=True)
-            loop_async = asyncio.get_running_loop()
             try:
-                results = await loop_async.run_in_executor(YTDLP_EXECUTOR, ytdlp_search, search_query)
+                results = await ytdlp_search(search_query)
                 filtered_results = [
                     entry for entry in results
                     if entry.get('duration') is not None or entry.get('is_live') or entry.get('live_status') == "is_live"
@@ -339,9 +290,8 @@ async def setup(bot):
                             )
                             return
                         await interaction.response.defer(ephemeral=True)
-                        loop_async = asyncio.get_running_loop()
                         try:
-                            info = await loop_async.run_in_executor(YTDLP_EXECUTOR, ytdlp_get_info, url)
+                            info = await ytdlp_get_info(url)
                         except Exception as exc:
                             await interaction.followup.send(
                                 f"Erreur lors de la récupération d'info : {exc}", ephemeral=True
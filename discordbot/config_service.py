@@ -0,0 +1,141 @@
+"""Typed access to config.json with hot reload.
+
+config.json is parsed once by bot_instance; everything here reads that same
+dict through `get_config()`. `start_config_watcher` polls the file's mtime and,
+when it changes, re-parses it and swaps the new values into the existing dict
+in place, so prompts, intensity labels and TTS/GPT options take effect without
+a restart. A file that fails to parse or lacks a required section is rejected
+and the running config is kept.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+try:  # Package relative import (python -m discordbot.main)
+    from .bot_instance import get_config, load_config_file, config_path  # type: ignore
+except Exception:  # pragma: no cover - fallback when run as script
+    try:
+        from bot_instance import get_config, load_config_file, config_path  # type: ignore
+    except Exception:
+        config_path = None  # type: ignore
+
+        def get_config():  # type: ignore
+            return {}
+
+        def load_config_file():  # type: ignore
+            return {}
+
+WATCH_INTERVAL_SECONDS = 5
+# Sections the command modules read without fallbacks
+REQUIRED_KEYS = ("prompts", "intensity_labels", "tts_default_instructions")
+
+_listeners: List[Callable[[dict], None]] = []
+_watch_task: Optional[asyncio.Task] = None
+_last_mtime: Optional[float] = None
+
+
+# ===========================
+# Accessors
+# ===========================
+
+def prompt(name: str) -> str:
+    """A system prompt from `prompts` (KeyError if missing, like the old import-time reads)."""
+    return get_config()["prompts"][name]
+
+
+def intensity_labels(kind: str) -> Dict[int, str]:
+    """`intensity_labels[kind]` with integer keys, e.g. {1: "gentil", ...}."""
+    raw = get_config()["intensity_labels"][kind]
+    return {int(key): value for key, value in raw.items()}
+
+
+def tts_default_instructions() -> str:
+    return get_config().get("tts_default_instructions", "")
+
+
+def mention_history_ttl_seconds() -> int:
+    return int(get_config()["mention_history_ttl_seconds"])
+
+
+def get_int(key: str, default: int) -> int:
+    try:
+        return int(get_config().get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_float(key: str, default: float) -> float:
+    try:
+        return float(get_config().get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_bool(key: str, default: bool) -> bool:
+    value = get_config().get(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+# ===========================
+# Hot reload
+# ===========================
+
+def on_config_reload(callback: Callable[[dict], None]) -> None:
+    """Register `callback(config)` to run after a successful reload."""
+    _listeners.append(callback)
+
+
+def _file_mtime() -> Optional[float]:
+    try:
+        return os.path.getmtime(config_path) if config_path else None
+    except OSError:
+        return None
+
+
+def reload_config() -> bool:
+    """Re-parse config.json into the live config dict; False (and no change) on error."""
+    global _last_mtime
+    _last_mtime = _file_mtime()
+    try:
+        fresh = load_config_file()
+        missing = [key for key in REQUIRED_KEYS if key not in fresh]
+        if missing:
+            raise ValueError(f"missing key(s): {', '.join(missing)}")
+    except Exception as ex:
+        logging.error("Config reload rejected, keeping the running config: %s", ex)
+        return False
+    cfg = get_config()
+    # Mutate in place: modules hold references to this dict. Update before
+    # dropping removed keys, so executor threads never see a half-empty config.
+    cfg.update(fresh)
+    for key in [key for key in cfg if key not in fresh]:
+        cfg.pop(key, None)
+    logging.info("Config reloaded from %s", config_path)
+    for callback in list(_listeners):
+        try:
+            callback(cfg)
+        except Exception as ex:
+            logging.warning("Config reload listener failed: %s", ex)
+    return True
+
+
+async def _watch_loop() -> None:
+    global _last_mtime
+    if _last_mtime is None:
+        _last_mtime = _file_mtime()
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL_SECONDS)
+        mtime = _file_mtime()
+        if mtime is not None and mtime != _last_mtime:
+            reload_config()
+
+
+def start_config_watcher() -> None:
+    """Start polling config.json for changes (idempotent)."""
+    global _watch_task
+    if _watch_task is None or _watch_task.done():
+        _watch_task = asyncio.create_task(_watch_loop())
@@ -0,0 +1,43 @@
+"""Shared SQLite database (data/bot.db) for small bot-side stores.
+
+Connections are per thread and opened in WAL mode, so the two bot profiles
+and their background threads can read while another writes. Each store
+registers its tables with `init_schema`, which runs its script once per
+process.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = BASE_DIR / "data" / "bot.db"
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schemas_ready = set()
+
+
+def get_connection() -> sqlite3.Connection:
+    """This thread's connection to DB_PATH (created on first use)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(DB_PATH), timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        _local.conn = conn
+    return conn
+
+
+def init_schema(name: str, script: str) -> None:
+    """Run `script` (CREATE ... IF NOT EXISTS statements) once per process for `name`."""
+    if name in _schemas_ready:
+        return
+    with _schema_lock:
+        if name in _schemas_ready:
+            return
+        get_connection().executescript(script)
+        _schemas_ready.add(name)
@@ -1,49 +1,166 @@
+"""Per-guild settings, stored one row per (guild, key) in the shared SQLite db.
+
+Writes are single-row upserts/deletes, so the main and musiconly processes
+can both write without clobbering each other. Reads are served from an
+in-memory copy that is reloaded only when the counter in
+guild_settings_version changed; triggers bump it on every write to
+guild_settings, so commits to other bot.db tables (command history) do not
+invalidate it, while a write from the other process is picked up on next read.
+The old guild_settings.json is imported once and renamed to `.migrated`.
+"""
+
 import json
+import logging
 import os
 import threading
-from typing import Dict, Any, Optional
+from typing import Any, Dict, Optional
+
+try:
+    from . import db  # type: ignore
+    from .config_service import tts_default_instructions  # type: ignore
+except ImportError:  # script fallback
+    import db  # type: ignore
+    from config_service import tts_default_instructions  # type: ignore
 
-# Load config to get TTS instruction defaults
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'config.json'))
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    _config = json.load(f)
-_tts_instructions = _config.get("tts_default_instructions", "")
 
-_DEFAULTS: Dict[str, Any] = {
-    "tts_instructions": _tts_instructions
-}
+def _defaults() -> Dict[str, Any]:
+    # Read on each call so a config reload changes the default instructions
+    return {"tts_instructions": tts_default_instructions()}
+
 
 _LOCK = threading.Lock()
 _STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'guild_settings.json'))
 
-# In-memory cache
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (guild_id, key)
+);
+CREATE TABLE IF NOT EXISTS guild_settings_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO guild_settings_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS guild_settings_inserted AFTER INSERT ON guild_settings
+BEGIN UPDATE guild_settings_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS guild_settings_updated AFTER UPDATE ON guild_settings
+BEGIN UPDATE guild_settings_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS guild_settings_deleted AFTER DELETE ON guild_settings
+BEGIN UPDATE guild_settings_version SET version = version + 1 WHERE id = 1; END;
+"""
+
+# In-memory cache, valid while guild_settings_version matches _cache_version
 _cache: Dict[str, Dict[str, Any]] = {}
+_cache_version: Optional[int] = None
+_migrated = False
 
-def _load() -> None:
-    global _cache
+
+def _conn():
+    db.init_schema("guild_settings", _SCHEMA)
+    conn = db.get_connection()
+    if not _migrated:
+        _migrate_json(conn)
+    return conn
+
+
+def _migrate_json(conn) -> None:
+    """Import the legacy JSON store once (whichever process gets the write lock first)."""
+    global _migrated
     if not os.path.exists(_STORE_PATH):
-        _cache = {}
+        _migrated = True
         return
+    conn.execute("BEGIN IMMEDIATE")
+    migrated_path = None
     try:
-        with open(_STORE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                _cache = {str(k): dict(v) for k, v in data.items()}
-            else:
-                _cache = {}
+        if not os.path.exists(_STORE_PATH):
+            conn.execute("ROLLBACK")
+            _migrated = True
+            return
+        try:
+            with open(_STORE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        rows = []
+        if isinstance(data, dict):
+            for gid, values in data.items():
+                if isinstance(values, dict):
+                    rows.extend((str(gid), k, json.dumps(v, ensure_ascii=False)) for k, v in values.items())
+        conn.executemany(
+            "INSERT OR IGNORE INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?)", rows
+        )
+        # Renamed under the write lock so the other process never imports it too
+        migrated_path = _STORE_PATH + '.migrated'
+        os.replace(_STORE_PATH, migrated_path)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        if migrated_path is not None and os.path.exists(migrated_path):
+            os.replace(migrated_path, _STORE_PATH)
+        raise
+    _migrated = True
+    logging.info("Migrated %d guild setting(s) from %s", len(rows), os.path.basename(_STORE_PATH))
+
+
+def _version(conn) -> int:
+    return conn.execute("SELECT version FROM guild_settings_version WHERE id = 1").fetchone()[0]
+
+
+def _load() -> None:
+    """Refresh the cache if the settings changed since it was loaded."""
+    global _cache, _cache_version
+    conn = _conn()
+    version = _version(conn)
+    if _cache_version == version:
+        return
+    _cache_version = version
+    fresh: Dict[str, Dict[str, Any]] = {}
+    for row in conn.execute("SELECT guild_id, key, value FROM guild_settings"):
+        try:
+            value = json.loads(row["value"]) if row["value"] is not None else None
+        except ValueError:
+            value = row["value"]
+        fresh.setdefault(row["guild_id"], {})[row["key"]] = value
+    _cache = fresh
+
+
+def _write(sql: str, args: tuple) -> None:
+    """Run one write; the caller updates `_cache` to match."""
+    global _cache_version
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = _version(conn)
+        conn.execute(sql, args)
+        after = _version(conn)
+        conn.execute("COMMIT")
     except Exception:
-        _cache = {}
+        conn.execute("ROLLBACK")
+        raise
+    if before == _cache_version:
+        # Nobody else wrote since the cache was loaded: it is current once the caller applies this write
+        _cache_version = after
+
 
+def _upsert(gid: str, key: str, value: Any) -> None:
+    _write(
+        "INSERT INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (guild_id, key) DO UPDATE SET value = excluded.value",
+        (gid, key, json.dumps(value, ensure_ascii=False)),
+    )
 
-def _save() -> None:
-    tmp_path = _STORE_PATH + '.tmp'
-    with open(tmp_path, 'w', encoding='utf-8') as f:
-        json.dump(_cache, f, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, _STORE_PATH)
+
+def _delete(gid: str, key: Optional[str] = None) -> None:
+    if key is None:
+        _write("DELETE FROM guild_settings WHERE guild_id = ?", (gid,))
+    else:
+        _write("DELETE FROM guild_settings WHERE guild_id = ? AND key = ?", (gid, key))
 
 
 def _merged_with_defaults(d: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    merged = dict(_DEFAULTS)
+    merged = _defaults()
     if d:
         merged.update({k: v for k, v in d.items() if v is not None})
     return merged
@@ -59,10 +176,10 @@ def set_guild_setting(guild_id: int, key: str, value: Any) -> Dict[str, Any]:
     with _LOCK:
         _load()
         gid = str(guild_id)
+        _upsert(gid, key, value)
         current = dict(_cache.get(gid) or {})
         current[key] = value
         _cache[gid] = current
-        _save()
         return _merged_with_defaults(current)
 
 
@@ -72,7 +189,7 @@ def reset_guild_settings(guild_id: int) -> None:
         gid = str(guild_id)
         if gid in _cache:
             del _cache[gid]
-            _save()
+            _delete(gid)
 
 
 def get_tts_instructions(guild, fallback: Optional[str] = None) -> str:
@@ -82,9 +199,9 @@ def get_tts_instructions(guild, fallback: Optional[str] = None) -> str:
     except Exception:
         gid = None
     if gid is None:
-        return fallback or _DEFAULTS["tts_instructions"]
+        return fallback or tts_default_instructions()
     settings = get_guild_settings(gid)
-    return settings.get("tts_instructions") or (fallback or _DEFAULTS["tts_instructions"])
+    return settings.get("tts_instructions") or (fallback or tts_default_instructions())
 
 
 def get_tts_instructions_for(guild, feature: str, fallback: Optional[str] = None) -> str:
@@ -105,14 +222,14 @@ def get_tts_instructions_for(guild, feature: str, fallback: Optional[str] = None
         gid = None
     if gid is None:
         # No guild: return fallback or default
-        return fallback or _DEFAULTS["tts_instructions"]
+        return fallback or tts_default_instructions()
     settings = get_guild_settings(gid)
     if feature_key and settings.get(feature_key):
         return settings[feature_key]
     # Fallback to global
     if settings.get("tts_instructions"):
         return settings["tts_instructions"]
-    return fallback or _DEFAULTS["tts_instructions"]
+    return fallback or tts_default_instructions()
 
 
 def clear_guild_setting(guild_id: int, key: str) -> None:
@@ -122,10 +239,9 @@ def clear_guild_setting(guild_id: int, key: str) -> None:
         gid = str(guild_id)
         cur = dict(_cache.get(gid) or {})
         if key in cur:
+            _delete(gid, key)
             del cur[key]
             if cur:
                 _cache[gid] = cur
             else:
                 _cache.pop(gid, None)
-            _save()
-
@@ -1,6 +1,20 @@
+"""Command history stored in the shared SQLite database (see db.py).
+
+`log_command` only queues the entry; a background thread inserts batches off
+the event loop. The table is indexed by guild, user, command and timestamp so
+`/history` and the query helpers below stay fast however long the log gets.
+Only the newest `history_max_entries` (config, default 50000) rows are kept.
+Older command_history.json / command_history.jsonl files are imported once and
+renamed to `.migrated`.
+"""
+
+import atexit
 import threading
 import json
+import logging
 import os
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
@@ -13,11 +27,235 @@ except Exception:
     except Exception:
         guild_settings = None  # type: ignore
 
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+try:
+    from . import db  # type: ignore
+except ImportError:  # script fallback
+    import db  # type: ignore
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
-HISTORY_FILE = DATA_DIR / "command_history.json"
+HISTORY_FILE = DATA_DIR / "command_history.json"  # legacy whole-file format
+HISTORY_LOG = DATA_DIR / "command_history.jsonl"  # legacy append-only log
+DEFAULT_MAX_ENTRIES = 50000
+# Trim old rows after this many inserts rather than on every batch
+TRIM_EVERY = 500
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 200
+# Failed inserts are retried with a doubling delay up to RETRY_MAX_SECONDS;
+# meanwhile at most MAX_PENDING entries are held, newer ones are dropped.
+RETRY_MAX_SECONDS = 30.0
+MAX_PENDING = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    user_id INTEGER,
+    user TEXT,
+    command TEXT NOT NULL,
+    params TEXT,
+    guild_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_history_guild ON command_history (guild_id, id);
+CREATE INDEX IF NOT EXISTS idx_history_user ON command_history (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_history_command ON command_history (command, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON command_history (timestamp);
+"""
+_COLUMNS = "timestamp, user_id, user, command, params, guild_id"
+
 _history_lock = threading.Lock()
+_cond = threading.Condition(_history_lock)
+_pending = deque()
+# Held while a batch moves from _pending to the table and while a query reads
+# both, so a query sees each entry exactly once
+_store_lock = threading.Lock()
+_writer = None
+_dropped = 0
+
+
+def _max_entries() -> int:
+    cfg = get_config() or {}
+    try:
+        return max(100, int(cfg.get("history_max_entries", DEFAULT_MAX_ENTRIES)))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_ENTRIES
+
+
+def _conn():
+    db.init_schema("command_history", _SCHEMA)
+    return db.get_connection()
+
+
+def _row_values(entry):
+    return (
+        entry.get("timestamp") or "",
+        entry.get("user_id"),
+        entry.get("user"),
+        entry.get("command") or "",
+        json.dumps(entry.get("params") or {}, ensure_ascii=False, default=str),
+        entry.get("guild_id"),
+    )
+
+
+def _row_to_entry(row) -> dict:
+    try:
+        params = json.loads(row["params"]) if row["params"] else {}
+    except ValueError:
+        params = {}
+    return {
+        "timestamp": row["timestamp"],
+        "user_id": row["user_id"],
+        "user": row["user"],
+        "command": row["command"],
+        "params": params,
+        "guild_id": row["guild_id"],
+    }
+
+
+def _legacy_entries(path: Path):
+    if path == HISTORY_FILE:
+        with open(path, "r", encoding="utf-8") as src:
+            data = json.load(src)
+        return [e for e in data if isinstance(e, dict)] if isinstance(data, list) else []
+    out = []
+    with open(path, "r", encoding="utf-8") as src:
+        for line in src:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                out.append(entry)
+    return out
+
+
+def _migrate_legacy() -> None:
+    """Import the JSON / JSON Lines history files once, oldest first."""
+    conn = _conn()
+    for path in (HISTORY_FILE, HISTORY_LOG):
+        if not path.exists():
+            continue
+        # IMMEDIATE takes the write lock up front so the other bot process
+        # can't import the same file concurrently.
+        conn.execute("BEGIN IMMEDIATE")
+        migrated = None
+        try:
+            if not path.exists():
+                conn.execute("ROLLBACK")
+                continue
+            try:
+                entries = _legacy_entries(path)
+            except Exception as ex:
+                logging.warning("Could not read legacy history %s: %s", path, ex)
+                entries = []
+            conn.executemany(
+                f"INSERT INTO command_history ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [_row_values(e) for e in entries],
+            )
+            # Renamed while the write lock is still held: the other process
+            # finds the file gone as soon as it can start its own transaction.
+            migrated = str(path) + ".migrated"
+            os.replace(path, migrated)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            if migrated is not None and os.path.exists(migrated):
+                os.replace(migrated, path)
+            raise
+        logging.info("Migrated %d history entries from %s", len(entries), path.name)
+
+
+def _trim() -> None:
+    conn = _conn()
+    with conn:
+        conn.execute(
+            "DELETE FROM command_history WHERE id <= (SELECT MAX(id) FROM command_history) - ?",
+            (_max_entries(),),
+        )
+
+
+def _insert(batch) -> None:
+    conn = _conn()
+    with conn:
+        conn.executemany(
+            f"INSERT INTO command_history ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(e) for e in batch],
+        )
+
+
+def _writer_loop() -> None:
+    global _dropped
+    try:
+        _migrate_legacy()
+        _trim()
+    except Exception:
+        logging.exception("History store start-up failed")
+    since_trim = 0
+    failures = 0
+    while True:
+        with _cond:
+            while not _pending:
+                _cond.wait()
+            # Give a burst of commands a moment to batch into one transaction
+            if failures == 0 and len(_pending) < FLUSH_BATCH:
+                _cond.wait(FLUSH_INTERVAL)
+            batch = list(_pending)
+        with _store_lock:
+            try:
+                _insert(batch)
+            except Exception as ex:
+                failures += 1
+                delay = min(RETRY_MAX_SECONDS, FLUSH_INTERVAL * 2 ** failures)
+                error = ex
+            else:
+                failures = 0
+                with _cond:
+                    # Entries leave the in-memory queue only once they are stored
+                    for _ in batch:
+                        _pending.popleft()
+                    if _dropped:
+                        logging.warning("Command history recovered; %d entries were dropped meanwhile", _dropped)
+                        _dropped = 0
+                    _cond.notify_all()
+        if failures:
+            # e.g. "database is locked": keep the batch queued and try again
+            logging.warning(
+                "Failed to write command history (%d queued), retrying in %.0fs: %s",
+                len(batch), delay, error,
+            )
+            time.sleep(delay)
+            continue
+        since_trim += len(batch)
+        if since_trim >= TRIM_EVERY:
+            try:
+                _trim()
+                since_trim = 0
+            except Exception as ex:
+                logging.warning("Failed to trim command history: %s", ex)
+
+
+def _ensure_writer() -> None:
+    # Caller holds _history_lock
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        _writer = threading.Thread(target=_writer_loop, name="history-writer", daemon=True)
+        _writer.start()
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Block until queued entries are stored (used at exit)."""
+    with _cond:
+        _cond.notify_all()
+        _cond.wait_for(lambda: not _pending, timeout=timeout)
+
+
+atexit.register(flush)
+
 
 def log_command(user, command_name, options, guild=None):
     entry = {
@@ -28,29 +266,106 @@ def log_command(user, command_name, options, guild=None):
         "params": options,
         "guild_id": guild.id if guild else None
     }
-    with _history_lock:
-        try:
-            if HISTORY_FILE.exists():
-                with open(HISTORY_FILE, "r", encoding="utf-8") as src:
-                    history = json.load(src)
-            else:
-                history = []
-        except Exception:
-            history = []
-        history.append(entry)
-        try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as out:
-                json.dump(history, out, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+    global _dropped
+    with _cond:
+        if len(_pending) >= MAX_PENDING:
+            # The database has been failing for a while; keep memory bounded
+            if not _dropped:
+                logging.warning("Command history queue full (%d entries), dropping new entries", MAX_PENDING)
+            _dropped += 1
+            return
+        _pending.append(entry)
+        _ensure_writer()
+        if len(_pending) >= FLUSH_BATCH:
+            _cond.notify_all()
+
+
+# ===========================
+# Queries
+# ===========================
+
+def _queued(predicate=None):
+    # Entries logged in the last second may not be inserted yet. Callers hold
+    # _store_lock, so none of these is also in the table.
+    with _cond:
+        return [e for e in _pending if predicate is None or predicate(e)]
+
+
+def _recent(where: str, args: tuple, n: int, predicate=None):
+    """Newest `n` entries matching `where`, newest first.
+
+    Blocking (SQLite): call it from an executor on the bot's event loop.
+    """
+    with _store_lock:
+        queued = _queued(predicate)
+        queued.reverse()
+        if len(queued) >= n:
+            return queued[:n]
+        cur = _conn().execute(
+            f"SELECT {_COLUMNS} FROM command_history {where} ORDER BY id DESC LIMIT ?",
+            args + (n - len(queued),),
+        )
+        rows = cur.fetchall()
+    return queued + [_row_to_entry(r) for r in rows]
+
+
+def _ts(value):
+    return value.isoformat(timespec="seconds") if isinstance(value, datetime) else value
+
 
 def get_recent_history(n=15):
-    with _history_lock:
-        try:
-            if not HISTORY_FILE.exists():
-                return []
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                items = json.load(f)
-        except Exception:
-            return []
-    return items[-n:] if len(items) > n else items
\ No newline at end of file
+    """Last `n` entries across all guilds, oldest first (legacy order)."""
+    return list(reversed(_recent("", (), n)))
+
+
+def recent_for_guild(guild_id, n=15):
+    """Last `n` commands used in `guild_id`, newest first."""
+    return _recent(
+        "WHERE guild_id = ?", (guild_id,), n,
+        lambda e: e.get("guild_id") == guild_id,
+    )
+
+
+def recent_for_user(user_id, n=15, guild_id=None):
+    """Last `n` commands by `user_id` (optionally within one guild), newest first."""
+    if guild_id is None:
+        return _recent("WHERE user_id = ?", (user_id,), n, lambda e: e.get("user_id") == user_id)
+    return _recent(
+        "WHERE user_id = ? AND guild_id = ?", (user_id, guild_id), n,
+        lambda e: e.get("user_id") == user_id and e.get("guild_id") == guild_id,
+    )
+
+
+def command_counts(since=None, until=None, guild_id=None):
+    """[(command, count), ...] over [since, until), most used first.
+
+    `since` / `until` are datetimes (UTC) or ISO strings; None leaves that side open.
+    """
+    since, until = _ts(since), _ts(until)
+    clauses, args = [], []
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        args.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        args.append(until)
+    if guild_id is not None:
+        clauses.append("guild_id = ?")
+        args.append(guild_id)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    def matches(e):
+        ts = e.get("timestamp") or ""
+        return ((since is None or ts >= since) and (until is None or ts < until)
+                and (guild_id is None or e.get("guild_id") == guild_id))
+
+    with _store_lock:
+        cur = _conn().execute(
+            f"SELECT command, COUNT(*) AS n FROM command_history {where} GROUP BY command",
+            tuple(args),
+        )
+        counts = {row["command"]: row["n"] for row in cur.fetchall()}
+        queued = _queued(matches)
+    for e in queued:
+        counts[e["command"]] = counts.get(e["command"], 0) + 1
+    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
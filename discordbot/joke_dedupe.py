@@ -0,0 +1,91 @@
+"""Near-duplicate detection for the joke corpus (word shingles + MinHash LSH).
+
+Jokes are normalised (case, punctuation, whitespace), cut into overlapping
+word 3-grams and summarised by a MinHash signature. Signatures are split into
+bands; jokes sharing a band bucket are candidates and are confirmed with the
+exact Jaccard similarity of their shingle sets, so each joke is compared with
+a handful of others rather than the whole corpus. The first joke of a group is
+kept: callers feed jokes best first.
+"""
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_float  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_float  # type: ignore
+
+SHINGLE_WORDS = 3
+NUM_PERM = 32
+BANDS = 8  # 8 bands x 4 rows: pairs above ~0.6 Jaccard almost always collide
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.7
+
+# XOR with a random 64-bit mask permutes the hash space; one mask per MinHash row
+_rng = random.Random(0x6A6F6B65)
+_PERMUTATIONS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def shingles(normalized: str) -> Set[str]:
+    words = normalized.split()
+    if len(words) <= SHINGLE_WORDS:
+        return {normalized}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _shingle_hash(shingle: str) -> int:
+    # Not hash(): str hashes are salted per process, signatures must be stable
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8, salt=b"jokes").digest()
+    return int.from_bytes(digest, "little")
+
+
+def minhash(shingle_set: Set[str]) -> Tuple[int, ...]:
+    hashes = [_shingle_hash(s) for s in shingle_set]
+    return tuple(min(h ^ m for h in hashes) for m in _PERMUTATIONS)
+
+
+class NearDuplicateFilter:
+    """Streaming filter: `add(text)` is True for a new joke, False for a near-duplicate."""
+
+    def __init__(self, threshold: Optional[float] = None):
+        if threshold is None:
+            threshold = get_float("joke_near_duplicate_threshold", DEFAULT_THRESHOLD)
+        self.threshold = threshold
+        self._exact: Set[str] = set()
+        self._shingles: List[Set[str]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        self.dropped = 0
+
+    def add(self, text: str) -> bool:
+        norm = normalize(text)
+        if norm in self._exact:
+            self.dropped += 1
+            return False
+        grams = shingles(norm)
+        sig = minhash(grams)
+        keys = [(b, sig[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+        checked = set()
+        for key in keys:
+            for other in self._buckets.get(key, ()):
+                if other in checked:
+                    continue
+                checked.add(other)
+                seen = self._shingles[other]
+                if len(grams & seen) >= self.threshold * len(grams | seen):
+                    self.dropped += 1
+                    return False
+        slot = len(self._shingles)
+        self._shingles.append(grams)
+        self._exact.add(norm)
+        for key in keys:
+            self._buckets[key].append(slot)
+        return True
@@ -0,0 +1,110 @@
+"""Compact joke corpus and sampler for /joke.
+
+Each subreddit's jokes are held as parallel lists (post id, joke text), best
+ranked first, with the rank weights exp(-RANK_BIAS * i) precomputed as a
+cumulative array, so a draw is one bisect instead of rebuilding and
+normalising the weights on every call. Each guild remembers its last
+`joke_recent_per_guild` (config, default 50) jokes and redraws to avoid them.
+"""
+
+import bisect
+import math
+import random
+import threading
+from array import array
+from collections import deque
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_int  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_int  # type: ignore
+
+RANK_BIAS = 0.02
+DEFAULT_RECENT_PER_GUILD = 50
+# Draws tried before accepting a recently played joke (tiny corpora)
+MAX_REDRAWS = 8
+
+
+class JokeIndex:
+    """The jokes of one subreddit, best ranked first."""
+
+    __slots__ = ("ids", "texts", "_cum_weights")
+
+    def __init__(self, records: Iterable[Tuple[str, str]] = (), bias: float = RANK_BIAS):
+        self.ids = []
+        self.texts = []
+        for joke_id, text in records:
+            self.ids.append(joke_id)
+            self.texts.append(text)
+        self._cum_weights = array("d", accumulate(math.exp(-bias * i) for i in range(len(self.texts))))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def records(self) -> Iterator[Tuple[str, str]]:
+        return zip(self.ids, self.texts)
+
+    def sample(self, rng=random) -> int:
+        """Rank-weighted random position, O(log n)."""
+        cum = self._cum_weights
+        i = bisect.bisect_right(cum, rng.random() * cum[-1])
+        return min(i, len(cum) - 1)
+
+
+class _RecentJokes:
+    __slots__ = ("order", "members")
+
+    def __init__(self, size: int):
+        self.order = deque(maxlen=size)
+        self.members = set()
+
+    def __contains__(self, key) -> bool:
+        return key in self.members
+
+    def add(self, key) -> None:
+        # joke_recent_per_guild = 0 turns the window off; don't grow `members`
+        if not self.order.maxlen or key in self.members:
+            return
+        if len(self.order) == self.order.maxlen:
+            self.members.discard(self.order[0])
+        self.order.append(key)
+        self.members.add(key)
+
+
+_recent_by_guild: Dict[int, _RecentJokes] = {}
+_recent_lock = threading.Lock()
+
+
+def _recent_for(guild_id) -> _RecentJokes:
+    size = max(0, get_int("joke_recent_per_guild", DEFAULT_RECENT_PER_GUILD))
+    recent = _recent_by_guild.get(guild_id)
+    if recent is None or recent.order.maxlen != size:
+        # New guild, or the window was changed in config.json
+        previous = list(recent.order) if recent else []
+        recent = _RecentJokes(size)
+        for key in previous[-size:] if size else []:
+            recent.add(key)
+        _recent_by_guild[guild_id] = recent
+    return recent
+
+
+def pick_joke(indexes: Dict[str, JokeIndex], guild_id=None, rng=random) -> Optional[str]:
+    """A joke from a uniformly chosen subreddit, rank-weighted within it.
+
+    Jokes recently played in `guild_id` are redrawn; None if there are no jokes.
+    """
+    subs = [sub for sub, index in indexes.items() if len(index)]
+    if not subs:
+        return None
+    with _recent_lock:
+        recent = _recent_for(guild_id) if guild_id is not None else None
+        for _ in range(MAX_REDRAWS):
+            index = indexes[rng.choice(subs)]
+            i = index.sample(rng)
+            if recent is None or index.ids[i] not in recent:
+                break
+        if recent is not None:
+            recent.add(index.ids[i])
+    return index.texts[i]
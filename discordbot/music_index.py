@@ -0,0 +1,317 @@
+"""Background index of the videos behind each music_sources.json category.
+
+Every source URL (video or playlist) is expanded once through the shared
+yt-dlp resolver and the flattened video list is persisted to
+data/music_index.json, so `/music` can start from memory instead of expanding
+the whole category on each invocation. The index is refreshed incrementally:
+only sources that are new, or older than `music_index_refresh_hours` (config,
+default 12), are expanded again, and edits to music_sources.json are picked up
+on the next check.
+
+Only one process refreshes the index: `start_music_index` takes an exclusive
+lock on data/music_index.lock, so a second bot profile with /music loaded
+expands sources on demand but leaves the background refresh to the first.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows: no cross-process guard
+    fcntl = None  # type: ignore
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+try:
+    from .ytdlp_resolver import expand_to_videos  # type: ignore
+except ImportError:  # script fallback
+    from ytdlp_resolver import expand_to_videos  # type: ignore
+
+BASE_DIR = Path(__file__).resolve().parent
+# Path to the JSON file defining categories and URLs
+MUSIC_SOURCES_PATH = BASE_DIR / "music_sources.json"
+INDEX_PATH = BASE_DIR / "data" / "music_index.json"
+LOCK_PATH = BASE_DIR / "data" / "music_index.lock"
+DEFAULT_REFRESH_HOURS = 12
+# How often the background task looks for file edits and stale sources
+WATCH_INTERVAL_SECONDS = 60
+# A source that failed to expand is retried after this delay, not every tick
+FAILED_RETRY_SECONDS = 15 * 60
+
+_sources: Dict[str, List[str]] = {}
+_sources_mtime: Optional[float] = None
+# source url -> {"videos": [...], "expanded_at": ts}
+_expanded: Dict[str, dict] = {}
+_failed_at: Dict[str, float] = {}
+_inflight: Dict[str, asyncio.Task] = {}
+# Reads data/music_index.json once, in an executor (see _load_index)
+_index_load: Optional[asyncio.Future] = None
+_index_task: Optional[asyncio.Task] = None
+# Open while this process owns the background refresh (see _acquire_index_lock)
+_lock_file = None
+
+
+def _read_music_sources() -> Dict[str, List[str]]:
+    try:
+        with open(MUSIC_SOURCES_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            return {}
+        normalized = {}
+        for k, v in data.items():
+            if not isinstance(k, str) or not isinstance(v, list):
+                continue
+            urls = [u.strip() for u in v if isinstance(u, str) and u.strip()]
+            normalized[k] = urls
+        return normalized
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        return {}
+
+
+def load_music_sources() -> Dict[str, List[str]]:
+    """Category -> source URLs, re-read only when music_sources.json changes."""
+    global _sources, _sources_mtime
+    try:
+        mtime = os.path.getmtime(MUSIC_SOURCES_PATH)
+    except OSError:
+        mtime = None
+    if mtime != _sources_mtime or mtime is None:
+        _sources = _read_music_sources()
+        _sources_mtime = mtime
+    return dict(_sources)
+
+
+def _refresh_seconds() -> float:
+    cfg = get_config() or {}
+    try:
+        return max(0.1, float(cfg.get("music_index_refresh_hours", DEFAULT_REFRESH_HOURS))) * 3600
+    except (TypeError, ValueError):
+        return DEFAULT_REFRESH_HOURS * 3600
+
+
+def _read_index() -> dict:
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("sources") or {}
+    except FileNotFoundError:
+        return {}
+    except Exception as ex:
+        logging.warning("Ignoring unreadable music index %s: %s", INDEX_PATH, ex)
+        return {}
+
+
+async def _merge_saved_index() -> None:
+    sources = await asyncio.get_running_loop().run_in_executor(None, _read_index)
+    for src, entry in sources.items():
+        if isinstance(entry, dict) and isinstance(entry.get("videos"), list):
+            _expanded.setdefault(src, entry)
+
+
+async def _load_index() -> None:
+    """Merge the saved index into memory once; the JSON is parsed off the event loop."""
+    global _index_load
+    if _index_load is None:
+        _index_load = asyncio.ensure_future(_merge_saved_index())
+    await asyncio.shield(_index_load)
+
+
+def _write_index(snapshot: str) -> None:
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = str(INDEX_PATH) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(snapshot)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+async def _save_index() -> None:
+    snapshot = json.dumps({"sources": _expanded}, ensure_ascii=False)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _write_index, snapshot)
+    except Exception as ex:
+        logging.warning("Failed to persist music index: %s", ex)
+
+
+async def _expand(src: str) -> List[str]:
+    try:
+        videos = await expand_to_videos(src)
+    except Exception as ex:
+        _failed_at[src] = time.time()
+        logging.warning("Music source expansion failed for %s: %s", src, ex)
+        raise
+    _failed_at.pop(src, None)
+    _expanded[src] = {"videos": list(videos), "expanded_at": time.time()}
+    return list(videos)
+
+
+async def expand_source(src: str, *, force: bool = False) -> List[str]:
+    """Video URLs behind one source, from the index unless missing or `force`d.
+
+    Concurrent callers for the same source share a single extraction.
+    """
+    await _load_index()
+    entry = _expanded.get(src)
+    if entry is not None and not force:
+        return list(entry["videos"])
+    task = _inflight.get(src)
+    if task is None:
+        task = asyncio.ensure_future(_expand(src))
+        _inflight[src] = task
+        task.add_done_callback(lambda _t, s=src: _inflight.pop(s, None))
+    return await asyncio.shield(task)
+
+
+def _dedupe(urls):
+    seen = set()
+    return [x for x in urls if not (x in seen or seen.add(x))]
+
+
+def cached_category_videos(category: str) -> Optional[List[str]]:
+    """Indexed videos for `category`, or None if any of its sources is not expanded yet.
+
+    Only sees the saved index once `_load_index` has been awaited.
+    """
+    sources = load_music_sources().get(category)
+    if not sources:
+        return None
+    out = []
+    for src in sources:
+        entry = _expanded.get(src)
+        if entry is None:
+            return None
+        out.extend(entry["videos"])
+    return _dedupe(out)
+
+
+async def iter_category_videos(category: str) -> AsyncIterator[List[str]]:
+    """Yield `category`'s video URLs source by source, as soon as each is known.
+
+    Indexed sources come out immediately; missing ones are expanded
+    concurrently and yielded in completion order, so a caller can start
+    playing before large playlists are done. Batches may overlap.
+    """
+    await _load_index()
+    cached = cached_category_videos(category)
+    if cached is not None:
+        yield cached
+        return
+    sources = load_music_sources().get(category, [])
+    tasks = [asyncio.ensure_future(expand_source(src)) for src in sources]
+    expanded_any = False
+    try:
+        for fut in asyncio.as_completed(tasks):
+            try:
+                videos = await fut
+            except Exception:
+                continue
+            expanded_any = True
+            yield videos
+    finally:
+        # expand_source shields the shared extraction, so this only drops our wait
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if expanded_any:
+            asyncio.ensure_future(_save_index())
+
+
+async def category_videos(category: str) -> List[str]:
+    """Flattened, deduplicated video URLs for `category`.
+
+    Served from memory when the index covers the category; otherwise the
+    missing sources are expanded now (and added to the index).
+    """
+    out = []
+    async for videos in iter_category_videos(category):
+        out.extend(videos)
+    return _dedupe(out)
+
+
+async def refresh_index(*, force: bool = False) -> int:
+    """Expand new or stale sources and drop removed ones; returns how many were expanded."""
+    await _load_index()
+    wanted = {src for srcs in load_music_sources().values() for src in srcs}
+    removed = [src for src in _expanded if src not in wanted]
+    for src in removed:
+        del _expanded[src]
+    now = time.time()
+    max_age = _refresh_seconds()
+    stale = [
+        src for src in sorted(wanted)
+        if force
+        or src not in _expanded
+        or now - _expanded[src].get("expanded_at", 0) >= max_age
+    ]
+    stale = [src for src in stale if force or now - _failed_at.get(src, 0) >= FAILED_RETRY_SECONDS]
+    expanded = 0
+    # One source at a time: the resolver pool is shared with playback
+    for src in stale:
+        try:
+            await expand_source(src, force=True)
+            expanded += 1
+        except Exception:
+            continue
+    if expanded or removed:
+        await _save_index()
+        logging.info("Music index refreshed: %d source(s) expanded, %d removed.", expanded, len(removed))
+    return expanded
+
+
+async def _index_loop() -> None:
+    while True:
+        try:
+            await refresh_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Music index refresh failed")
+        await asyncio.sleep(WATCH_INTERVAL_SECONDS)
+
+
+def _acquire_index_lock() -> bool:
+    """True if this process may run the background refresh (held until exit)."""
+    global _lock_file
+    if _lock_file is not None or fcntl is None:
+        return True
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    f = open(LOCK_PATH, "a")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _lock_file = f
+    return True
+
+
+def start_music_index() -> None:
+    """Start the background index task once per process, and in one process only."""
+    global _index_task
+    if _index_task is not None and not _index_task.done():
+        return
+    # Read the saved index now, so the first /music does not wait for it
+    asyncio.ensure_future(_load_index())
+    if not _acquire_index_lock():
+        logging.info("Music index is refreshed by another bot process; not starting a second indexer.")
+        return
+    _index_task = asyncio.create_task(_index_loop())
+
+
+def index_stats() -> dict:
+    sources = load_music_sources()
+    return {
+        "categories": len(sources),
+        "sources": sum(len(v) for v in sources.values()),
+        "indexed_sources": len(_expanded),
+        "videos": sum(len(e["videos"]) for e in _expanded.values()),
+        "failed_sources": len(_failed_at),
+    }
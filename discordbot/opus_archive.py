@@ -0,0 +1,269 @@
+"""Pre-encoded Opus archive for the bundled Audio/ clips (/jokeqc).
+
+Each MP3 is transcoded once with ffmpeg to 20 ms Opus packets, and all clips are
+concatenated into data/jokeqc_opus.bin (2-byte little-endian length + packet).
+data/jokeqc_opus.json records the SHA-256 of every source MP3, where its
+packets start and end, and the hash of the archive itself. `load_opus_archive`
+validates both on startup and re-transcodes only the clips whose MP3 changed;
+playback then reads packets straight from a memory map (`OpusClip`), with no
+decode or encode. Build ahead of time with `python -m discordbot.opus_archive`.
+Clips that could not be transcoded (no ffmpeg/libopus, broken MP3) play from
+the MP3; their hash is recorded under "failed" in the index so startup does not
+retry them until the MP3 changes or the archive is built by hand.
+Both bot processes warm the archive; an exclusive lock on data/jokeqc_opus.lock
+makes the second one wait for the first build and then load its result.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows: no cross-process guard
+    fcntl = None  # type: ignore
+
+try:  # Package relative import (python -m discordbot.opus_archive)
+    from .audio_sources import OpusClip  # type: ignore
+except ImportError:  # script fallback
+    from audio_sources import OpusClip  # type: ignore
+
+BASE_DIR = Path(__file__).resolve().parent
+AUDIO_DIR = BASE_DIR / "Audio"
+DATA_DIR = BASE_DIR / "data"
+ARCHIVE_PATH = DATA_DIR / "jokeqc_opus.bin"
+INDEX_PATH = DATA_DIR / "jokeqc_opus.json"
+LOCK_PATH = DATA_DIR / "jokeqc_opus.lock"
+ARCHIVE_VERSION = 1
+OPUS_BITRATE = "96k"
+TRANSCODE_WORKERS = 4
+TRANSCODE_TIMEOUT_SECONDS = 120
+
+_lock = threading.Lock()
+_clips: Dict[str, OpusClip] = {}
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ogg_packets(data: bytes) -> Iterator[bytes]:
+    """Packets of an Ogg stream (lacing values < 255 end a packet)."""
+    pos = 0
+    partial = b""
+    while pos + 27 <= len(data):
+        if data[pos:pos + 4] != b"OggS":
+            raise ValueError(f"bad Ogg page at byte {pos}")
+        count = data[pos + 26]
+        lacing = data[pos + 27:pos + 27 + count]
+        pos += 27 + count
+        for size in lacing:
+            partial += data[pos:pos + size]
+            pos += size
+            if size < 255:
+                yield partial
+                partial = b""
+
+
+def _transcode(path: Path) -> bytes:
+    """The clip as archive records (length-prefixed Opus packets)."""
+    proc = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(path),
+            "-map", "0:a:0", "-c:a", "libopus", "-b:a", OPUS_BITRATE,
+            "-ar", "48000", "-ac", "2", "-frame_duration", "20", "-application", "audio",
+            "-f", "ogg", "pipe:1",
+        ],
+        capture_output=True, check=True, timeout=TRANSCODE_TIMEOUT_SECONDS,
+    )
+    out = bytearray()
+    for packet in _ogg_packets(proc.stdout):
+        if packet.startswith((b"OpusHead", b"OpusTags")) or not packet:
+            continue
+        out += len(packet).to_bytes(2, "little")
+        out += packet
+    return bytes(out)
+
+
+def _count_packets(records: bytes) -> int:
+    pos = count = 0
+    while pos + 2 <= len(records):
+        pos += 2 + int.from_bytes(records[pos:pos + 2], "little")
+        count += 1
+    return count
+
+
+def _read_index() -> dict:
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != ARCHIVE_VERSION or index.get("bitrate") != OPUS_BITRATE:
+        return {}
+    return index
+
+
+def _archive_valid(index: dict) -> bool:
+    try:
+        return bool(index) and _sha256_file(ARCHIVE_PATH) == index.get("archive_sha256")
+    except OSError:
+        return False
+
+
+def _source_files() -> Dict[str, Path]:
+    if not AUDIO_DIR.exists():
+        return {}
+    return {p.name: p for p in sorted(AUDIO_DIR.iterdir()) if p.suffix.lower() == ".mp3"}
+
+
+def _known_failures(index: dict, hashes: Dict[str, str]) -> Dict[str, str]:
+    """Clips whose transcoding already failed for their current MP3."""
+    failed = index.get("failed") or {}
+    return {name: digest for name, digest in failed.items() if hashes.get(name) == digest}
+
+
+@contextmanager
+def _archive_lock():
+    """Exclusive across both bot processes while the archive is checked or built."""
+    if fcntl is None:
+        yield
+        return
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _build(sources: Dict[str, Path], hashes: Dict[str, str], index: dict,
+           retry_failed: bool = False) -> dict:
+    """Write a new archive + index; clips whose MP3 hash is unchanged are copied over."""
+    old_clips = index.get("clips", {}) if _archive_valid(index) else {}
+    old_data = b""
+    if old_clips:
+        with open(ARCHIVE_PATH, "rb") as f:
+            old_data = f.read()
+
+    failed = {} if retry_failed else _known_failures(index, hashes)
+    records: Dict[str, bytes] = {}
+    todo: List[str] = []
+    for name in sources:
+        old = old_clips.get(name)
+        if old and old.get("sha256") == hashes[name]:
+            records[name] = old_data[old["start"]:old["end"]]
+        elif name not in failed:
+            todo.append(name)
+
+    def transcode(name: str):
+        try:
+            return name, _transcode(sources[name])
+        except (OSError, subprocess.SubprocessError, ValueError) as ex:
+            logging.warning("Opus archive: could not transcode %s: %s", name, ex)
+            return name, None
+
+    if todo:
+        logging.info("Opus archive: transcoding %d clip(s)...", len(todo))
+        with ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS) as pool:
+            for name, data in pool.map(transcode, todo):
+                if data:
+                    records[name] = data
+                else:
+                    failed[name] = hashes[name]
+
+    clips = {}
+    digest = hashlib.sha256()
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_archive = str(ARCHIVE_PATH) + ".tmp"
+    with open(tmp_archive, "wb") as f:
+        pos = 0
+        for name in sources:
+            data = records.get(name)
+            if not data:
+                continue
+            f.write(data)
+            digest.update(data)
+            clips[name] = {
+                "sha256": hashes[name], "start": pos, "end": pos + len(data),
+                "packets": _count_packets(data),
+            }
+            pos += len(data)
+    new_index = {
+        "version": ARCHIVE_VERSION, "bitrate": OPUS_BITRATE,
+        "archive_sha256": digest.hexdigest(), "clips": clips, "failed": failed,
+    }
+    tmp_index = str(INDEX_PATH) + ".tmp"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump(new_index, f, indent=1)
+    # The archive hash in the index catches a crash between the two renames
+    os.replace(tmp_archive, ARCHIVE_PATH)
+    os.replace(tmp_index, INDEX_PATH)
+    logging.info("Opus archive: %d/%d clip(s) stored in %s", len(clips), len(sources), ARCHIVE_PATH.name)
+    if failed:
+        logging.warning(
+            "Opus archive: %d clip(s) play from MP3 until they change or the archive is rebuilt "
+            "by hand: %s", len(failed), ", ".join(sorted(failed)),
+        )
+    return new_index
+
+
+def load_opus_archive(rebuild: bool = True, retry_failed: bool = False) -> int:
+    """Validate (and if needed rebuild) the archive and map it; returns the clip count.
+
+    Clips that failed to transcode before are only retried with `retry_failed`.
+    Blocking (hashing, ffmpeg): run it in an executor from the bot.
+    """
+    global _clips
+    with _lock, _archive_lock():
+        sources = _source_files()
+        hashes = {name: _sha256_file(path) for name, path in sources.items()}
+        index = _read_index()
+        clips = index.get("clips", {})
+        covered = set(clips) | (set() if retry_failed else set(_known_failures(index, hashes)))
+        up_to_date = (
+            _archive_valid(index)
+            and set(clips) <= set(sources)
+            and all(clips[name].get("sha256") == hashes[name] for name in clips)
+            and (covered == set(sources) or not rebuild)
+        )
+        if not up_to_date:
+            if not rebuild:
+                return 0
+            index = _build(sources, hashes, index, retry_failed)
+            clips = index["clips"]
+        if not clips:
+            _clips = {}
+            return 0
+        with open(ARCHIVE_PATH, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Never closed explicitly: clips still playing keep the previous mapping alive
+        _clips = {
+            name: OpusClip(name, mapping, entry["start"], entry["end"], entry["packets"])
+            for name, entry in clips.items()
+        }
+        return len(_clips)
+
+
+def get_opus_clip(name: str) -> Optional[OpusClip]:
+    """The archived clip for Audio/<name>, or None (not built yet, or transcoding failed)."""
+    return _clips.get(name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count = load_opus_archive(retry_failed=True)
+    print(f"{count} clip(s) in {ARCHIVE_PATH}")
@@ -1,17 +1,44 @@
+"""Reddit joke corpus.
+
+Subreddits are fetched concurrently over one shared aiohttp session, with at
+most REDDIT_CONCURRENCY requests in flight. The filtered corpus is saved to
+data/reddit_jokes.json after every refresh and loaded back at startup by
+`load_reddit_snapshot`, so `/joke` works right away while the network refresh
+runs in the background. Only each post's id and joke text are kept, in one
+`JokeIndex` per subreddit (see joke_index.py).
+"""
+
 import asyncio
-import requests
+import aiohttp
+import json
 import logging
 import os
+import tempfile
 import time
 from collections import defaultdict
+from pathlib import Path
+
+try:  # Package relative import (python -m discordbot.main)
+    from .joke_index import JokeIndex, pick_joke  # type: ignore
+    from .joke_dedupe import NearDuplicateFilter  # type: ignore
+except ImportError:  # script fallback
+    from joke_index import JokeIndex, pick_joke  # type: ignore
+    from joke_dedupe import NearDuplicateFilter  # type: ignore
 
 REDDIT_SUBREDDITS = ["darkjokes", "jokes", "dadjokes"]
 REDDIT_MAX_LENGTH = 350
 REDDIT_HEADERS = {"User-Agent": "Mozilla/5.0"}
 REDDIT_BLOCK_COOLDOWN_SECONDS = int(os.environ.get("REDDIT_BLOCK_COOLDOWN_SECONDS", "900"))
+REDDIT_CONCURRENCY = int(os.environ.get("REDDIT_CONCURRENCY", "2"))
+SNAPSHOT_PATH = Path(__file__).resolve().parent / "data" / "reddit_jokes.json"
 _jokes_lock = asyncio.Lock()
-_reddit_jokes_by_sub = defaultdict(list)
+_reddit_jokes_by_sub = {}
 _reddit_blocked_until = defaultdict(float)
+_session = None
+_request_slots = None
+
+def _reddit_enabled() -> bool:
+    return os.environ.get("LOAD_REDDIT", "false").lower() == "true"
 
 def _is_blocked(subreddit: str) -> bool:
     return time.time() < _reddit_blocked_until.get(subreddit, 0)
@@ -19,59 +46,177 @@ def _is_blocked(subreddit: str) -> bool:
 def _set_blocked(subreddit: str) -> None:
     _reddit_blocked_until[subreddit] = time.time() + REDDIT_BLOCK_COOLDOWN_SECONDS
 
-async def fetch_reddit_top(subreddit, headers, max_posts=1000):
+def _get_session() -> aiohttp.ClientSession:
+    global _session, _request_slots
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers=REDDIT_HEADERS, timeout=aiohttp.ClientTimeout(total=10)
+        )
+    if _request_slots is None:
+        _request_slots = asyncio.Semaphore(max(1, REDDIT_CONCURRENCY))
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def fetch_reddit_top(subreddit, headers=None, max_posts=1000):
+    """Page through r/<subreddit> top of the year; returns (posts, blocked)."""
     url = f"https://www.reddit.com/r/{subreddit}/top.json?t=year&limit=100"
-    loop = asyncio.get_event_loop()
-    def fetch():
-        posts, after = [], None
-        while len(posts) < max_posts:
-            page_url = url + (f"&after={after}" if after else "")
-            try:
-                r = requests.get(page_url, headers=headers, timeout=10)
-                if r.status_code == 403:
-                    return posts[:max_posts], True
-                r.raise_for_status()
-                data = r.json()["data"]
-                children = data.get("children", [])
-                if not children: break
-                posts.extend(children)
-                after = data.get("after")
-                if not after or len(children) < 100: break
-            except Exception as ex:
-                logging.warning(f"Reddit fetch error: {ex}")
-                break
-        return posts[:max_posts], False
-    return await loop.run_in_executor(None, fetch)
+    session = _get_session()
+    posts, after = [], None
+    while len(posts) < max_posts:
+        page_url = url + (f"&after={after}" if after else "")
+        try:
+            async with _request_slots:
+                async with session.get(page_url, headers=headers) as r:
+                    if r.status == 403:
+                        return posts[:max_posts], True
+                    r.raise_for_status()
+                    data = (await r.json())["data"]
+            children = data.get("children", [])
+            if not children: break
+            posts.extend(children)
+            after = data.get("after")
+            if not after or len(children) < 100: break
+        except Exception as ex:
+            logging.warning(f"Reddit fetch error: {ex}")
+            break
+    return posts[:max_posts], False
+
+def _joke_text(d) -> str:
+    return f"{d.get('title','')}. {d.get('selftext','')}".strip()
+
+def _snapshot_records(items):
+    # [id, text] pairs; snapshots from before the joke index stored post dicts
+    for item in items:
+        if isinstance(item, dict):
+            text = _joke_text(item)
+            yield item.get("id") or text.lower(), text
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            yield item[0], item[1]
+
+def _write_snapshot(payload: str) -> None:
+    SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Own temp file per write: both bot processes may refresh at the same time
+    f = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=SNAPSHOT_PATH.parent, prefix=SNAPSHOT_PATH.name + ".",
+        suffix=".tmp", delete=False,
+    )
+    try:
+        with f:
+            f.write(payload)
+        os.replace(f.name, SNAPSHOT_PATH)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
+
+def _read_snapshot():
+    with open(SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+async def load_reddit_snapshot():
+    """Load the corpus saved by the last refresh, if any (no network)."""
+    if not _reddit_enabled():
+        return
+    global _reddit_jokes_by_sub
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(None, _read_snapshot)
+    except FileNotFoundError:
+        logging.info("[Reddit] No joke snapshot yet; waiting for the first fetch.")
+        return
+    except Exception as ex:
+        logging.warning(f"[Reddit] Ignoring unreadable joke snapshot: {ex}")
+        return
+    async with _jokes_lock:
+        if any(_reddit_jokes_by_sub.values()):
+            return  # a network refresh already finished
+        restored = {
+            sub: JokeIndex(_snapshot_records(items))
+            for sub, items in (data.get("subs") or {}).items()
+        }
+        _reddit_jokes_by_sub = restored
+    age_h = (time.time() - data.get("saved_at", time.time())) / 3600
+    logging.info(f"[Reddit] Loaded {sum(len(x) for x in restored.values())} jokes from snapshot ({age_h:.1f}h old).")
+
+def _build_corpus(fetched, previous):
+    """Filter and dedupe into {sub: [(id, text), ...]}; returns (corpus, duplicates dropped).
+
+    Subs run in REDDIT_SUBREDDITS order and posts in rank order, so the copy
+    kept of a near-duplicate group is the best-ranked one of the first sub.
+    Subs that failed this time keep their previous jokes.
+    """
+    unique = defaultdict(list)
+    dupes = NearDuplicateFilter()
+    for sub in REDDIT_SUBREDDITS:
+        if sub in fetched:
+            records = []
+            for post in fetched[sub]:
+                d = post["data"]
+                text = _joke_text(d)
+                records.append((d.get("subreddit", sub).lower(), d.get("id") or text.lower(), text))
+        else:
+            index = previous.get(sub)
+            records = [(sub, jid, text) for jid, text in index.records()] if index else []
+        for owner, jid, text in records:
+            if 0 < len(text) <= REDDIT_MAX_LENGTH and dupes.add(text):
+                unique[owner].append((jid, text))
+    return unique, dupes.dropped
 
 async def load_reddit_jokes():
-    if os.environ.get("LOAD_REDDIT", "false").lower() != "true":
+    if not _reddit_enabled():
         logging.info("[Reddit] Skipping Reddit joke loading due to LOAD_REDDIT env variable.")
         return
     global _reddit_jokes_by_sub
     async with _jokes_lock:
-        unique = defaultdict(list)
-        seen = set()
+        active = []
         for sub in REDDIT_SUBREDDITS:
             if _is_blocked(sub):
                 retry_in = int(_reddit_blocked_until[sub] - time.time())
                 logging.info(f"[Reddit] Skipping r/{sub}; blocked recently. Retry in {max(retry_in, 0)}s.")
                 continue
-            posts, blocked = await fetch_reddit_top(sub, REDDIT_HEADERS, max_posts=1000)
+            active.append(sub)
+        results = await asyncio.gather(*(fetch_reddit_top(sub, max_posts=1000) for sub in active))
+        fetched = {}
+        for sub, (posts, blocked) in zip(active, results):
             if blocked:
                 _set_blocked(sub)
                 logging.warning(
                     f"[Reddit] 403 for r/{sub}; pausing requests for {REDDIT_BLOCK_COOLDOWN_SECONDS}s."
                 )
                 continue
-            for post in posts:
-                d = post["data"]
-                joke_text = f"{d.get('title','')}. {d.get('selftext','')}".strip()
-                k = joke_text.lower()
-                if 0 < len(joke_text) <= REDDIT_MAX_LENGTH and k not in seen:
-                    unique[d.get('subreddit', sub).lower()].append(post)
-                    seen.add(k)
-        _reddit_jokes_by_sub = unique
-        logging.info(f"[Reddit] Loaded {sum(len(x) for x in unique.values())} unique jokes.")
+            if posts:
+                fetched[sub] = posts
+        if not fetched:
+            logging.warning("[Reddit] Refresh fetched nothing; keeping the current jokes.")
+            return
+        loop = asyncio.get_running_loop()
+        # Near-duplicate detection is CPU work; keep it off the event loop
+        unique, dropped = await loop.run_in_executor(None, _build_corpus, fetched, _reddit_jokes_by_sub)
+        _reddit_jokes_by_sub = {sub: JokeIndex(records) for sub, records in unique.items()}
+        logging.info(
+            f"[Reddit] Loaded {sum(len(x) for x in unique.values())} unique jokes "
+            f"({dropped} near-duplicates collapsed)."
+        )
+        payload = json.dumps(
+            {"saved_at": time.time(), "subs": {s: [list(r) for r in v] for s, v in unique.items()}},
+            ensure_ascii=False,
+        )
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _write_snapshot, payload)
+    except Exception as ex:
+        logging.warning(f"[Reddit] Could not save joke snapshot: {ex}")
 
 def get_reddit_jokes():
-    return _reddit_jokes_by_sub
\ No newline at end of file
+    """Subreddit -> JokeIndex."""
+    return _reddit_jokes_by_sub
+
+def pick_reddit_joke(guild_id=None):
+    """Joke text for /joke, avoiding the guild's recent ones; None if the corpus is empty."""
+    return pick_joke(_reddit_jokes_by_sub, guild_id)
@@ -0,0 +1,193 @@
+"""Startup orchestration for on_ready.
+
+Commands are registered and synced first so the bot is usable as soon as
+possible (the global sync is skipped when the command tree hash matches the
+last synced one, see `sync_commands_if_changed`); data sources (Reddit jokes,
+TTS websocket pool, /jokeqc Opus archive, /music index, config watcher) then
+load as background tasks. Each subsystem gets a readiness flag that commands
+can check with `is_ready` and answer with `warming_up_message` instead of
+blocking, and every phase's duration is logged.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from discord.ext import tasks
+
+try:  # Package relative import (python -m discordbot.main)
+    from .reddit_loader import load_reddit_jokes, load_reddit_snapshot, get_reddit_jokes  # type: ignore
+    from .config_service import start_config_watcher  # type: ignore
+    from .tts_util import warm_tts_pool  # type: ignore
+    from .opus_archive import load_opus_archive  # type: ignore
+    from .music_index import start_music_index  # type: ignore
+except ImportError:  # script fallback
+    from reddit_loader import load_reddit_jokes, load_reddit_snapshot, get_reddit_jokes  # type: ignore
+    from config_service import start_config_watcher  # type: ignore
+    from tts_util import warm_tts_pool  # type: ignore
+    from opus_archive import load_opus_archive  # type: ignore
+    from music_index import start_music_index  # type: ignore
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# User-facing names for the "warming up" reply
+SUBSYSTEM_LABELS = {
+    "commands": "commandes",
+    "reddit": "blagues Reddit",
+}
+
+_ready = {}
+_timings = {}
+_started_at = None
+_background_tasks = set()
+
+
+def is_ready(name: str) -> bool:
+    return _ready.get(name, False)
+
+
+def mark_ready(name: str) -> None:
+    if not _ready.get(name):
+        _ready[name] = True
+        since = time.perf_counter() - _started_at if _started_at is not None else 0.0
+        logging.info("Startup: %s ready (%.2fs after start).", name, since)
+
+
+def warming_up_message(name: str) -> str:
+    label = SUBSYSTEM_LABELS.get(name, name)
+    return f"Le bot est encore en train de charger ({label}), réessaie dans quelques secondes."
+
+
+def startup_timings() -> dict:
+    """Phase name -> seconds, for phases that have finished."""
+    return dict(_timings)
+
+
+@contextmanager
+def phase(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[name] = time.perf_counter() - t0
+        logging.info("Startup phase '%s' took %.2fs.", name, _timings[name])
+
+
+def _in_background(name: str, coro) -> None:
+    async def runner():
+        try:
+            with phase(name):
+                await coro
+        except Exception:
+            logging.exception("Startup phase '%s' failed", name)
+
+    task = asyncio.create_task(runner())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@tasks.loop(hours=24)
+async def refresh_reddit_jokes():
+    logging.info("Refreshing Reddit jokes (background)...")
+    try:
+        await load_reddit_jokes()
+        logging.info("Reddit jokes refreshed.")
+    finally:
+        # Even a failed first fetch ends the warm-up: /joke then reports "no jokes"
+        mark_ready("reddit")
+
+
+async def _warm_reddit() -> None:
+    # The snapshot makes /joke usable immediately; the loop's first run refetches
+    await load_reddit_snapshot()
+    if any(get_reddit_jokes().values()):
+        mark_ready("reddit")
+    if not refresh_reddit_jokes.is_running():
+        refresh_reddit_jokes.start()
+
+
+async def _warm_jokeqc() -> None:
+    # Hashing and any transcoding are blocking; /jokeqc plays the MP3s meanwhile
+    count = await asyncio.get_running_loop().run_in_executor(None, load_opus_archive)
+    logging.info("Opus archive ready: %d clip(s).", count)
+    mark_ready("jokeqc")
+
+
+def command_tree_hash(bot) -> str:
+    """SHA-256 of the global command payloads (names, descriptions, parameters)."""
+    payloads = []
+    for cmd in bot.tree.get_commands():
+        try:
+            payloads.append(cmd.to_dict(bot.tree))
+        except TypeError:  # discord.py < 2.4: to_dict() takes no tree
+            payloads.append(cmd.to_dict())
+    payloads.sort(key=lambda p: (p.get("type", 1), p.get("name", "")))
+    blob = json.dumps(
+        {"application_id": bot.application_id, "commands": payloads},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _hash_path() -> Path:
+    profile = (os.getenv("COMMAND_PROFILE") or "single").lower()
+    return DATA_DIR / f"command_tree_{profile}.sha256"
+
+
+async def sync_commands_if_changed(bot, expected: int = 0) -> bool:
+    """Call tree.sync() only if the tree differs from the last synced one; True if synced.
+
+    Set FORCE_COMMAND_SYNC=1 to sync regardless.
+    """
+    digest = command_tree_hash(bot)
+    path = _hash_path()
+    force = os.getenv("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+    try:
+        previous = path.read_text(encoding="utf-8").strip()
+    except OSError:
+        previous = None
+    if previous == digest and not force:
+        logging.info("Slash commands unchanged since last sync (%s...); skipping sync.", digest[:12])
+        return False
+    cmds = await bot.tree.sync()
+    logging.info(f"Slash commands synced: {len(cmds)} cmds (expected ~{expected})")
+    try:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(digest, encoding="utf-8")
+    except OSError as ex:
+        logging.warning("Could not store command tree hash: %s", ex)
+    return True
+
+
+async def run_startup(bot) -> list:
+    """Register and sync commands, then warm data sources in the background."""
+    global _started_at
+    _started_at = time.perf_counter()
+    try:
+        from .commands import setup_all_commands
+    except ImportError:
+        from commands import setup_all_commands  # type: ignore
+
+    with phase("commands"):
+        loaded = await setup_all_commands(bot)
+    if not loaded:
+        logging.error("No command modules loaded! Check import errors above or profile configuration.")
+    with phase("sync"):
+        await sync_commands_if_changed(bot, expected=len(loaded))
+    mark_ready("commands")
+
+    _in_background("reddit", _warm_reddit())
+    if "jokes" in loaded:
+        _in_background("jokeqc", _warm_jokeqc())
+    # Opens the realtime TTS websockets in the background
+    warm_tts_pool()
+    if "music" in loaded:
+        # Expand every category in the background so /music starts from memory
+        start_music_index()
+    start_config_watcher()
+    mark_ready("config")
+    return loaded
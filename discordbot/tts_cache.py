@@ -0,0 +1,227 @@
+"""Content-addressed on-disk cache for rendered TTS clips.
+
+Entries are keyed by a hash of (provider, voice, sample rate, instructions,
+text) and hold the exact bytes `run_tts_async` would have written (WAV for
+xAI, MP3 for edge-tts), plus a `.txt` sidecar with the text the xAI model
+actually spoke, so a hit reports the same text as a fresh render. The cache
+is bounded by `tts_cache_max_mb` (config, default 256) and evicts least
+recently used clips first. All methods are thread-safe, so `run_tts_async`
+runs them in executor threads. Both bot profiles may share the directory: a
+write re-scans it before evicting, so the budget covers both processes' clips
+(a hit touches the file's mtime, which orders the LRU), and a clip evicted by
+the other process is simply treated as a miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / "data" / "tts_cache"
+DEFAULT_MAX_MB = 256
+_SUFFIX = ".audio"
+# Sidecar holding what the model actually said (xAI may rephrase the input)
+_TEXT_SUFFIX = ".txt"
+
+
+def make_key(provider: str, voice: str, sample_rate: int, instructions: str, text: str) -> str:
+    payload = json.dumps(
+        [provider, voice, int(sample_rate or 0), instructions or "", text],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSRenderCache:
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._scanned = False
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def _text_path(self, key: str) -> Path:
+        return self.directory / f"{key}{_TEXT_SUFFIX}"
+
+    def _remove(self, key: str) -> None:
+        for path in (self._path(key), self._text_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _ensure_scanned(self) -> None:
+        # Caller holds the lock.
+        if not self._scanned:
+            self._scan()
+            self._evict()
+
+    def _scan(self) -> None:
+        # Caller holds the lock. Rebuild the LRU order from mtimes, including the
+        # clips written by the other process.
+        self._scanned = True
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            found = []
+            for p in self.directory.glob(f"*{_SUFFIX}"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                found.append((st.st_mtime, p.stem, st.st_size))
+        except OSError as ex:
+            logging.warning("TTS cache scan failed: %s", ex)
+            return
+        self._entries.clear()
+        self._bytes = 0
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def _evict(self) -> None:
+        # Caller holds the lock.
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._remove(key)
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Return (clip bytes, spoken text) and mark the clip recently used, or None on a miss.
+
+        The spoken text is "" when it was not recorded (same as the input text).
+        """
+        with self._lock:
+            self._ensure_scanned()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                self._forget(key)
+                self.misses += 1
+                return None
+            try:
+                spoken_text = self._text_path(key).read_text(encoding="utf-8")
+            except OSError:
+                spoken_text = ""
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data, spoken_text
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached clip bytes and mark them recently used, or None on a miss."""
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def copy_to(self, key: str, filename: str) -> Optional[str]:
+        """Write the cached clip to `filename`; returns its spoken text, or None on a miss."""
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        with open(filename, "wb") as out:
+            out.write(entry[0])
+        return entry[1]
+
+    def put(self, key: str, data: bytes, spoken_text: str = "") -> None:
+        if not data or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._ensure_scanned()
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.directory), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(data)
+                # Text first: a reader that finds the new clip also finds its text
+                if spoken_text:
+                    self._text_path(key).write_text(spoken_text, encoding="utf-8")
+                else:
+                    try:
+                        os.remove(self._text_path(key))
+                    except FileNotFoundError:
+                        pass
+                os.replace(tmp_path, self._path(key))
+            except OSError as ex:
+                logging.warning("TTS cache write failed: %s", ex)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._scan()
+            self._evict()
+
+    def put_file(self, key: str, filename: str, spoken_text: str = "") -> None:
+        try:
+            with open(filename, "rb") as src:
+                data = src.read()
+        except OSError:
+            return
+        self.put(key, data, spoken_text)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ensure_scanned()
+            self._entries.clear()
+            self._bytes = 0
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[TTSRenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSRenderCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cfg = get_config() or {}
+            try:
+                max_mb = float(cfg.get("tts_cache_max_mb", DEFAULT_MAX_MB))
+            except (TypeError, ValueError):
+                max_mb = DEFAULT_MAX_MB
+            _cache = TTSRenderCache(CACHE_DIR, int(max_mb * 1024 * 1024))
+        return _cache
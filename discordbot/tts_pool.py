@@ -0,0 +1,230 @@
+"""Pool of pre-connected xAI realtime websocket sessions for TTS.
+
+Sessions are keyed by (voice, sample rate) and are already configured
+(`session.update`) when handed out, so a synthesis only sends its text.
+`acquire` returns an idle session, or opens one when none is ready; once the
+idle set runs dry it is topped back up to `tts_ws_pool_size` (config,
+default 2; 0 disables pooling) in the background. `release` deletes the
+conversation items the request created and waits for the server to confirm
+before the session is reused; sessions that errored, were cancelled
+mid-response, failed the reset or are older than MAX_SESSION_AGE_SECONDS are
+closed instead. The pool is emptied when config.json is reloaded (API key or
+voice may have changed).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import websockets
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_config, get_int, on_config_reload  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config, get_int, on_config_reload  # type: ignore
+
+REALTIME_URL = "wss://api.x.ai/v1/realtime"
+DEFAULT_POOL_SIZE = 2
+MAX_SESSION_AGE_SECONDS = 600
+RESET_TIMEOUT_SECONDS = 5
+
+PoolKey = Tuple[str, int]
+
+
+class RealtimeSession:
+    """One websocket plus what it was configured with."""
+
+    __slots__ = ("ws", "key", "instructions", "created_at", "uses", "from_pool", "item_ids")
+
+    def __init__(self, ws, key: PoolKey):
+        self.ws = ws
+        self.key = key
+        self.instructions = ""
+        self.created_at = time.monotonic()
+        self.uses = 0
+        # True when the current user got it from the idle set (it may have gone stale)
+        self.from_pool = False
+        # Conversation items created during the current use, deleted on release
+        self.item_ids: List[str] = []
+
+    def is_open(self) -> bool:
+        return getattr(self.ws, "close_code", None) is None
+
+    def is_fresh(self) -> bool:
+        return self.is_open() and time.monotonic() - self.created_at < MAX_SESSION_AGE_SECONDS
+
+    async def send(self, payload: dict) -> None:
+        await self.ws.send(json.dumps(payload))
+
+    async def recv(self) -> dict:
+        event = json.loads(await self.ws.recv())
+        etype = event.get("type")
+        if etype == "error":
+            error = event.get("error") or {}
+            raise RuntimeError(f"xAI realtime error: {error.get('message') or error}")
+        if etype in ("conversation.item.created", "conversation.item.added"):
+            item_id = (event.get("item") or {}).get("id")
+            if item_id and item_id not in self.item_ids:
+                self.item_ids.append(item_id)
+        return event
+
+    async def configure(self, instructions: str) -> None:
+        voice, sample_rate = self.key
+        await self.send({
+            "type": "session.update",
+            "session": {
+                "voice": voice,
+                "instructions": instructions or "",
+                "turn_detection": {"type": None},
+                "audio": {
+                    "output": {"format": {"type": "audio/pcm", "rate": sample_rate}},
+                },
+            },
+        })
+        self.instructions = instructions or ""
+
+    async def reset(self) -> None:
+        """Delete this use's conversation items and wait for the acknowledgements."""
+        pending = set(self.item_ids)
+        for item_id in self.item_ids:
+            await self.send({"type": "conversation.item.delete", "item_id": item_id})
+        self.item_ids = []
+        while pending:
+            event = await self.recv()
+            if event.get("type") == "conversation.item.deleted":
+                pending.discard(event.get("item_id"))
+
+    async def close(self) -> None:
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+_idle: Dict[PoolKey, List[RealtimeSession]] = {}
+_refills: Dict[PoolKey, asyncio.Task] = {}
+_background: Set[asyncio.Task] = set()
+
+
+def _pool_size() -> int:
+    return max(0, get_int("tts_ws_pool_size", DEFAULT_POOL_SIZE))
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _connect(key: PoolKey) -> RealtimeSession:
+    api_key = (get_config() or {}).get("xai_api_key")
+    if not api_key:
+        raise RuntimeError("Missing xAI API key (xai_api_key).")
+    ws = await websockets.connect(
+        uri=REALTIME_URL,
+        ssl=True,
+        additional_headers={"Authorization": f"Bearer {api_key}"},
+    )
+    session = RealtimeSession(ws, key)
+    try:
+        await session.configure("")
+    except Exception:
+        await session.close()
+        raise
+    return session
+
+
+async def _refill(key: PoolKey) -> None:
+    idle = _idle.setdefault(key, [])
+    while len(idle) < _pool_size():
+        try:
+            session = await _connect(key)
+        except Exception as ex:
+            logging.warning("Could not pre-connect xAI realtime session: %s", ex)
+            return
+        if len(idle) >= _pool_size():  # released sessions filled it meanwhile
+            await session.close()
+            return
+        idle.append(session)
+
+
+def _schedule_refill(key: PoolKey) -> None:
+    task = _refills.get(key)
+    if _pool_size() and (task is None or task.done()):
+        _refills[key] = asyncio.create_task(_refill(key))
+
+
+def prewarm(voice: str, sample_rate: int) -> None:
+    """Open the idle sessions for (voice, sample_rate) ahead of the first request."""
+    _schedule_refill((voice, sample_rate))
+
+
+async def acquire(voice: str, sample_rate: int, fresh: bool = False) -> RealtimeSession:
+    """A configured session for (voice, sample_rate); pass it back to `release`.
+
+    `fresh=True` skips the idle sessions and opens a new connection.
+    """
+    key = (voice, sample_rate)
+    idle = [] if fresh else (_idle.get(key) or [])
+    session: Optional[RealtimeSession] = None
+    while idle:
+        candidate = idle.pop()
+        if candidate.is_fresh():
+            session = candidate
+            session.from_pool = True
+            break
+        _spawn(candidate.close())
+    if not _idle.get(key):
+        # Released sessions refill the set under steady load; connect only when it ran dry
+        _schedule_refill(key)
+    if session is None:
+        session = await _connect(key)
+    session.uses += 1
+    return session
+
+
+async def _recycle(session: RealtimeSession) -> None:
+    try:
+        await asyncio.wait_for(session.reset(), timeout=RESET_TIMEOUT_SECONDS)
+    except Exception as ex:
+        logging.debug("Dropping xAI realtime session after failed reset: %s", ex)
+        await session.close()
+        return
+    idle = _idle.setdefault(session.key, [])
+    if session.is_fresh() and len(idle) < _pool_size():
+        idle.append(session)
+    else:
+        await session.close()
+
+
+def release(session: RealtimeSession, healthy: bool) -> None:
+    """Return `session` to the pool; `healthy=False` (error, cancellation) closes it."""
+    if healthy and _pool_size():
+        _spawn(_recycle(session))
+    else:
+        _spawn(session.close())
+
+
+async def close_all() -> None:
+    for task in _refills.values():
+        task.cancel()
+    _refills.clear()
+    sessions = [s for idle in _idle.values() for s in idle]
+    _idle.clear()
+    await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+
+
+def pool_stats() -> dict:
+    return {f"{voice}@{rate}": len(idle) for (voice, rate), idle in _idle.items()}
+
+
+def _on_config_reload(_cfg: dict) -> None:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _spawn(close_all())
+
+
+on_config_reload(_on_config_reload)
@@ -1,11 +1,18 @@
 import asyncio
 import base64
-import json
+import io
 import logging
 import re
 import wave
-from typing import Optional
-import websockets
+from typing import Callable, Optional
+try:
+    from . import tts_pool  # type: ignore
+    from .audio_sources import AudioStreamBuffer  # type: ignore
+    from .tts_cache import get_tts_cache, make_key  # type: ignore
+except ImportError:  # script fallback
+    import tts_pool  # type: ignore
+    from audio_sources import AudioStreamBuffer  # type: ignore
+    from tts_cache import get_tts_cache, make_key  # type: ignore
 try:
     import edge_tts  # type: ignore
 except Exception:  # pragma: no cover
@@ -38,85 +45,108 @@ def _normalize_voice(voice: Optional[str]) -> str:
     return "Ara"
 
 
-async def _run_voice_agent_tts(text: str, instructions: str, voice: str, sample_rate: int) -> tuple[bytes, str]:
-    cfg = get_config()
-    api_key = cfg.get("xai_api_key")
-    if not api_key:
-        raise RuntimeError("Missing xAI API key (xai_api_key).")
+async def _run_voice_agent_tts(
+    text: str,
+    instructions: str,
+    voice: str,
+    sample_rate: int,
+    on_audio: Optional[Callable[[bytes], object]] = None,
+) -> tuple[bytes, str]:
+    """Run one realtime synthesis; with `on_audio`, PCM deltas are handed over as they arrive instead of collected.
 
-    base_url = "wss://api.x.ai/v1/realtime"
-    audio_chunks: list[bytes] = []
+    The websocket comes from tts_pool. A reused session that fails before any
+    audio arrived (e.g. the server dropped it while idle) is retried once on
+    a new connection.
+    """
+    for attempt in (1, 2):
+        session = await tts_pool.acquire(voice, sample_rate, fresh=attempt > 1)
+        audio_chunks: list[bytes] = []
+        delivered = [False]
+
+        def deliver(chunk: bytes) -> None:
+            delivered[0] = True
+            if on_audio is not None:
+                on_audio(chunk)
+            else:
+                audio_chunks.append(chunk)
+
+        healthy = False
+        try:
+            result = await _voice_agent_exchange(session, text, instructions, deliver)
+            healthy = True
+            return b"".join(audio_chunks), result
+        except Exception:
+            if attempt == 1 and session.from_pool and not delivered[0]:
+                logging.info("Pooled xAI realtime session failed; retrying on a new connection.")
+                continue
+            raise
+        finally:
+            tts_pool.release(session, healthy)
+
+
+async def _voice_agent_exchange(session, text: str, instructions: str, deliver: Callable[[bytes], None]) -> str:
+    if session.instructions != (instructions or ""):
+        await session.configure(instructions)
     text_chunks: list[str] = []
 
-    async with websockets.connect(
-        uri=base_url,
-        ssl=True,
-        additional_headers={"Authorization": f"Bearer {api_key}"},
-    ) as ws:
-        # Configure session
-        session_config = {
-            "type": "session.update",
-            "session": {
-                "voice": voice,
-                "instructions": instructions or "",
-                "turn_detection": {"type": None},
-                "audio": {
-                    "output": {"format": {"type": "audio/pcm", "rate": sample_rate}},
-                },
-            },
-        }
-        await ws.send(json.dumps(session_config))
-
-        # Send user text
-        user_msg = {
-            "type": "conversation.item.create",
-            "item": {
-                "type": "message",
-                "role": "user",
-                "content": [{"type": "input_text", "text": text}],
-            },
-        }
-        await ws.send(json.dumps(user_msg))
-
-        # Request response with audio
-        verbatim_instruction = (
-            "Lis le dernier message utilisateur mot pour mot, sans rien ajouter, "
-            "retirer, reformuler ni traduire. Respecte la ponctuation et l'ordre des mots."
-        )
-        merged_instructions = (instructions or "").strip()
-        if merged_instructions:
-            merged_instructions = f"{merged_instructions}\n{verbatim_instruction}"
-        else:
-            merged_instructions = verbatim_instruction
-        response_req = {
-            "type": "response.create",
-            "response": {
-                "modalities": ["audio", "text"],
-                "instructions": merged_instructions,
-            },
-        }
-        await ws.send(json.dumps(response_req))
-
-        # Read stream
-        while True:
-            raw = await ws.recv()
-            event = json.loads(raw)
-            etype = event.get("type")
-            if etype == "response.output_audio.delta":
-                delta = event.get("delta")
-                if isinstance(delta, str) and delta:
-                    audio_chunks.append(base64.b64decode(delta))
-            elif etype == "response.output_text.delta":
-                delta = event.get("delta")
-                if isinstance(delta, str) and delta:
-                    text_chunks.append(delta)
-            elif etype == "response.output_audio.done":
-                break
-            elif etype == "response.done":
-                # In case output_audio.done was skipped
-                break
-
-    return b"".join(audio_chunks), "".join(text_chunks).strip()
+    # Send user text
+    user_msg = {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "message",
+            "role": "user",
+            "content": [{"type": "input_text", "text": text}],
+        },
+    }
+    await session.send(user_msg)
+
+    # Request response with audio
+    verbatim_instruction = (
+        "Lis le dernier message utilisateur mot pour mot, sans rien ajouter, "
+        "retirer, reformuler ni traduire. Respecte la ponctuation et l'ordre des mots."
+    )
+    merged_instructions = (instructions or "").strip()
+    if merged_instructions:
+        merged_instructions = f"{merged_instructions}\n{verbatim_instruction}"
+    else:
+        merged_instructions = verbatim_instruction
+    response_req = {
+        "type": "response.create",
+        "response": {
+            "modalities": ["audio", "text"],
+            "instructions": merged_instructions,
+        },
+    }
+    await session.send(response_req)
+
+    # Read stream up to response.done, so no event of this response is left
+    # for the session's next user
+    while True:
+        event = await session.recv()
+        etype = event.get("type")
+        if etype == "response.output_audio.delta":
+            delta = event.get("delta")
+            if isinstance(delta, str) and delta:
+                deliver(base64.b64decode(delta))
+        elif etype == "response.output_text.delta":
+            delta = event.get("delta")
+            if isinstance(delta, str) and delta:
+                text_chunks.append(delta)
+        elif etype == "response.done":
+            break
+
+    return "".join(text_chunks).strip()
+
+
+def warm_tts_pool() -> None:
+    """Pre-connect realtime sessions for the configured voice (no-op for edge-tts)."""
+    cfg = get_config() or {}
+    if str(cfg.get("tts_provider", "")).lower().strip() == "edge" or not cfg.get("xai_api_key"):
+        return
+    try:
+        tts_pool.prewarm(_normalize_voice(cfg.get("tts_voice")), int(cfg["tts_sample_rate"]))
+    except (KeyError, TypeError, ValueError) as ex:
+        logging.warning("TTS pool not pre-warmed: %s", ex)
 
 
 async def _run_edge_tts(text: str, voice: str, filename: str) -> None:
@@ -126,6 +156,15 @@ async def _run_edge_tts(text: str, voice: str, filename: str) -> None:
     await communicate.save(filename)
 
 
+async def _stream_edge_tts(text: str, voice: str, on_audio: Callable[[bytes], object]) -> None:
+    if edge_tts is None:
+        raise RuntimeError("edge-tts is not installed.")
+    communicate = edge_tts.Communicate(text=text, voice=voice)
+    async for chunk in communicate.stream():
+        if chunk.get("type") == "audio" and chunk.get("data"):
+            on_audio(chunk["data"])
+
+
 def _detect_refusal(text: str) -> bool:
     if not text:
         return False
@@ -232,9 +271,41 @@ def quebecify_text(text: str) -> str:
     return result
 
 
-def run_tts(text: str, filename: str, instructions: str) -> tuple[bool, str]:
-    """Generate TTS audio and write to `filename`.
-
+def _render_cache_key(cfg: dict, text: str, instructions: str) -> str:
+    provider = str(cfg["tts_provider"]).lower().strip()
+    if provider == "edge":
+        # edge-tts ignores instructions and has a fixed output format
+        return make_key("edge", cfg["tts_edge_voice"], 0, "", text)
+    return make_key(
+        "xai", _normalize_voice(cfg["tts_voice"]), int(cfg["tts_sample_rate"]), instructions or "", text
+    )
+
+
+def _pcm_to_wav_bytes(pcm: bytes, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _write_wav(filename: str, pcm: bytes, sample_rate: int) -> None:
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+
+
+async def run_tts_async(text: str, filename: str, instructions: str) -> tuple[bool, str]:
+    """Generate TTS audio and write to `filename`, on the caller's event loop.
+
+    Identical requests are served from the on-disk render cache (tts_cache)
+    without contacting the provider; only the cache and file I/O go to the
+    default executor. Cancelling the awaiting task (e.g. `asyncio.wait_for`
+    timing out) closes the provider connection.
     Returns tuple of (success: bool, generated_text: str).
     """
     cfg = get_config() or {}
@@ -243,31 +314,38 @@ def run_tts(text: str, filename: str, instructions: str) -> tuple[bool, str]:
     sample_rate = int(cfg["tts_sample_rate"])
     edge_voice = cfg["tts_edge_voice"]
     fallback_on_refusal = bool(cfg["tts_fallback_on_refusal"])
+    cache = get_tts_cache()
+    cache_key = _render_cache_key(cfg, text, instructions)
+    loop = asyncio.get_running_loop()
 
     try:
+        cached_text = await loop.run_in_executor(None, cache.copy_to, cache_key, filename)
+        if cached_text is not None:
+            return (True, cached_text or text)
+
         if provider == "edge":
-            asyncio.run(_run_edge_tts(text, edge_voice, filename))
+            await _run_edge_tts(text, edge_voice, filename)
+            await loop.run_in_executor(None, cache.put_file, cache_key, filename)
             return (True, text)
 
-        audio_bytes, response_text = asyncio.run(
-            _run_voice_agent_tts(text, instructions, voice, sample_rate)
-        )
+        audio_bytes, response_text = await _run_voice_agent_tts(text, instructions, voice, sample_rate)
         if not audio_bytes:
             return (False, "")
 
         # Write PCM16 WAV file
-        with wave.open(filename, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 16-bit
-            wf.setframerate(sample_rate)
-            wf.writeframes(audio_bytes)
-
-        if fallback_on_refusal and edge_tts is not None and _detect_refusal(response_text):
-            try:
-                asyncio.run(_run_edge_tts(text, edge_voice, filename))
-                return (True, text)
-            except Exception:
-                pass
+        await loop.run_in_executor(None, _write_wav, filename, audio_bytes, sample_rate)
+
+        if _detect_refusal(response_text):
+            if fallback_on_refusal and edge_tts is not None:
+                try:
+                    await _run_edge_tts(text, edge_voice, filename)
+                    await loop.run_in_executor(None, cache.put_file, cache_key, filename)
+                    return (True, text)
+                except Exception:
+                    pass
+        else:
+            # Refusals are not cached: a retry may well succeed
+            await loop.run_in_executor(None, cache.put_file, cache_key, filename, response_text or "")
 
         spoken_text = response_text or text
         return (True, spoken_text)
@@ -276,6 +354,204 @@ def run_tts(text: str, filename: str, instructions: str) -> tuple[bool, str]:
         return (False, "")
 
 
+TTS_STREAM_TIMEOUT_SECONDS = 60
+# Sentences shorter than this are merged with the next one (fewer requests,
+# more natural prosody); longer ones are cut at a comma or space.
+SEGMENT_MIN_CHARS = 40
+SEGMENT_MAX_CHARS = 300
+DEFAULT_PARALLEL_SEGMENTS = 3
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
 
 
+class _StreamClosed(Exception):
+    """Raised inside the producer when the player side closed the stream."""
 
+
+def tts_streaming_enabled() -> bool:
+    cfg = get_config() or {}
+    return bool(cfg.get("tts_streaming", True))
+
+
+def _parallel_segments() -> int:
+    cfg = get_config() or {}
+    try:
+        return max(1, int(cfg.get("tts_parallel_segments", DEFAULT_PARALLEL_SEGMENTS)))
+    except (TypeError, ValueError):
+        return DEFAULT_PARALLEL_SEGMENTS
+
+
+def _cut_long(sentence: str) -> list[str]:
+    parts = []
+    while len(sentence) > SEGMENT_MAX_CHARS:
+        head = sentence[:SEGMENT_MAX_CHARS]
+        cut = max(head.rfind(", "), head.rfind("; "))
+        if cut < SEGMENT_MIN_CHARS:
+            cut = head.rfind(" ")
+        if cut < SEGMENT_MIN_CHARS:
+            cut = SEGMENT_MAX_CHARS - 1
+        parts.append(sentence[:cut + 1].strip())
+        sentence = sentence[cut + 1:].strip()
+    if sentence:
+        parts.append(sentence)
+    return parts
+
+
+def split_tts_segments(text: str) -> list[str]:
+    """Split `text` at sentence boundaries into segments synthesized separately."""
+    segments: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current = f"{current} {sentence}" if current else sentence
+        if len(current) >= SEGMENT_MIN_CHARS:
+            segments.extend(_cut_long(current))
+            current = ""
+    if current:
+        if segments and len(segments[-1]) + len(current) < SEGMENT_MAX_CHARS:
+            segments[-1] = f"{segments[-1]} {current}"
+        else:
+            segments.append(current)
+    return segments or [text]
+
+
+async def _stream_segment(cfg: dict, provider: str, text: str, instructions: str, sample_rate: int, on_audio) -> str:
+    """Synthesize one segment into `on_audio`; returns the model's text (for refusal checks)."""
+    if provider == "edge":
+        await asyncio.wait_for(
+            _stream_edge_tts(text, cfg["tts_edge_voice"], on_audio), timeout=TTS_STREAM_TIMEOUT_SECONDS
+        )
+        return ""
+    _, response_text = await asyncio.wait_for(
+        _run_voice_agent_tts(
+            text, instructions, _normalize_voice(cfg["tts_voice"]), sample_rate, on_audio=on_audio
+        ),
+        timeout=TTS_STREAM_TIMEOUT_SECONDS,
+    )
+    return response_text
+
+
+async def _stream_segments(cfg: dict, provider: str, segments: list[str], instructions: str,
+                           sample_rate: int, on_audio) -> list[str]:
+    """Synthesize `segments` concurrently (at most `tts_parallel_segments` at once) and
+    hand their audio to `on_audio` strictly in order.
+
+    Segment 1 is forwarded as it arrives; later segments are buffered until
+    their turn, so playback only ever waits on the segment being played.
+    """
+    slots = asyncio.Semaphore(_parallel_segments())
+    queues = [asyncio.Queue() for _ in segments]
+
+    async def render(segment: str, queue: asyncio.Queue) -> None:
+        async with slots:
+            try:
+                response_text = await _stream_segment(
+                    cfg, provider, segment, instructions, sample_rate,
+                    lambda chunk: queue.put_nowait(("audio", chunk)),
+                )
+            except Exception as ex:
+                queue.put_nowait(("error", ex))
+                return
+            queue.put_nowait(("done", response_text))
+
+    # Tasks queue on the semaphore in creation (= playback) order
+    workers = [asyncio.create_task(render(seg, q)) for seg, q in zip(segments, queues)]
+    texts: list[str] = []
+    try:
+        for queue in queues:
+            while True:
+                kind, value = await queue.get()
+                if kind == "audio":
+                    on_audio(value)
+                elif kind == "done":
+                    texts.append(value)
+                    break
+                else:
+                    raise value
+    finally:
+        for worker in workers:
+            worker.cancel()
+    return texts
+
+
+async def _produce_tts_stream(text: str, instructions: str, stream: AudioStreamBuffer, cache_key: str) -> None:
+    cfg = get_config() or {}
+    provider = str(cfg["tts_provider"]).lower().strip()
+    rendered: list[bytes] = []
+
+    def on_audio(chunk: bytes) -> None:
+        if not stream.write(chunk):
+            raise _StreamClosed()
+        rendered.append(chunk)
+
+    loop = asyncio.get_running_loop()
+    try:
+        # Off the event loop: a hit reads the whole clip from disk
+        cached = await loop.run_in_executor(None, _cached_stream_audio, cache_key, stream.codec)
+        if cached:
+            stream.write(cached)
+            stream.finish()
+            return
+        # MP3 segments would not join cleanly (encoder delay and padding leave a gap at
+        # each seam), and edge-tts already streams progressively: only split PCM.
+        segments = split_tts_segments(text) if stream.codec == "pcm" else [text]
+        if len(segments) == 1:
+            response_texts = [
+                await _stream_segment(cfg, provider, text, instructions, stream.sample_rate, on_audio)
+            ]
+        else:
+            response_texts = await _stream_segments(
+                cfg, provider, segments, instructions, stream.sample_rate, on_audio
+            )
+    except (asyncio.CancelledError, _StreamClosed):
+        stream.finish()
+        return
+    except Exception as ex:
+        logging.error(f"TTS streaming failed: {ex}")
+        stream.finish(ex)
+        return
+    stream.finish()
+    if rendered and not any(_detect_refusal(t) for t in response_texts):
+        audio = b"".join(rendered)
+        if stream.codec == "pcm":
+            audio = _pcm_to_wav_bytes(audio, stream.sample_rate)
+        spoken_text = " ".join(t.strip() for t in response_texts if t and t.strip())
+        await loop.run_in_executor(None, get_tts_cache().put, cache_key, audio, spoken_text)
+
+
+def _cached_stream_audio(cache_key: str, codec: str) -> Optional[bytes]:
+    """The cached clip as stream payload (PCM frames or MP3 bytes), or None. Blocking."""
+    data = get_tts_cache().get(cache_key)
+    if not data:
+        return None
+    if codec != "pcm":
+        return data
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            return wf.readframes(wf.getnframes())
+    except Exception as ex:
+        logging.warning("Ignoring unreadable TTS cache entry: %s", ex)
+        return None
+
+
+def open_tts_stream(text: str, instructions: str) -> AudioStreamBuffer:
+    """Start synthesizing `text` in the background and return the buffer it fills.
+
+    Must be called from the bot's event loop. Queue the result with
+    `audio_player.play_source` once `await stream.wait_ready()` is True; playback
+    then starts while the rest of the audio is still arriving. Texts of several
+    sentences are rendered segment by segment in parallel (`split_tts_segments`,
+    xAI only), so the wait only depends on the first segment. The refusal
+    fallback of `run_tts_async` does not apply here, the audio is already
+    playing.
+    """
+    cfg = get_config() or {}
+    provider = str(cfg["tts_provider"]).lower().strip()
+    cache_key = _render_cache_key(cfg, text, instructions)
+    if provider == "edge":
+        stream = AudioStreamBuffer("mp3")
+    else:
+        stream = AudioStreamBuffer("pcm", int(cfg["tts_sample_rate"]))
+    stream.producer_task = asyncio.create_task(_produce_tts_stream(text, instructions, stream, cache_key))
+    return stream
@@ -0,0 +1,115 @@
+"""Per-guild voice connection manager.
+
+Keeps the guild's VoiceClient alive between queued audio items so a burst of
+clips only pays the voice handshake once. The connection is dropped after
+`voice_idle_timeout_seconds` (config, default 120) without playback, or right
+away when no human is left in the bot's channel and nothing is playing.
+"""
+
+import asyncio
+import logging
+import discord
+
+try:  # package context
+    from .bot_instance import bot  # type: ignore
+except Exception:  # script fallback
+    try:
+        from bot_instance import bot  # type: ignore
+    except Exception:  # final fallback placeholder (should not happen in normal runs)
+        bot = None  # type: ignore
+try:
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+
+DEFAULT_IDLE_TIMEOUT_SECONDS = 120
+
+_idle_tasks = {}
+
+
+def _idle_timeout() -> float:
+    cfg = get_config() or {}
+    try:
+        return max(0.0, float(cfg.get("voice_idle_timeout_seconds", DEFAULT_IDLE_TIMEOUT_SECONDS)))
+    except (TypeError, ValueError):
+        return float(DEFAULT_IDLE_TIMEOUT_SECONDS)
+
+
+def get_voice_client(guild):
+    if bot is None or guild is None:
+        return None
+    return discord.utils.get(bot.voice_clients, guild=guild)
+
+
+async def ensure_connected(guild, voice_channel):
+    """Return a connected VoiceClient in `voice_channel`, reusing the current one when possible."""
+    cancel_idle_disconnect(guild.id)
+    vc = get_voice_client(guild)
+    if not vc or not vc.is_connected():
+        vc = await voice_channel.connect()
+    elif vc.channel != voice_channel:
+        await vc.move_to(voice_channel)
+    return vc
+
+
+def cancel_idle_disconnect(guild_id) -> None:
+    task = _idle_tasks.pop(guild_id, None)
+    if task and not task.done():
+        task.cancel()
+
+
+def schedule_idle_disconnect(guild) -> None:
+    """(Re)start the idle timer; the guild disconnects if nothing plays before it expires."""
+    if guild is None:
+        return
+    cancel_idle_disconnect(guild.id)
+    timeout = _idle_timeout()
+    _idle_tasks[guild.id] = asyncio.create_task(_idle_disconnect_after(guild, timeout))
+
+
+async def _idle_disconnect_after(guild, timeout: float) -> None:
+    try:
+        await asyncio.sleep(timeout)
+    except asyncio.CancelledError:
+        return
+    if _idle_tasks.get(guild.id) is asyncio.current_task():
+        _idle_tasks.pop(guild.id, None)
+    vc = get_voice_client(guild)
+    if vc and vc.is_connected() and not (vc.is_playing() or vc.is_paused()):
+        logging.info("Voice idle for %ss in guild %s; disconnecting.", int(timeout), guild.id)
+        await disconnect(guild)
+
+
+async def disconnect(guild) -> None:
+    cancel_idle_disconnect(guild.id)
+    vc = get_voice_client(guild)
+    if not vc:
+        return
+    try:
+        await asyncio.wait_for(vc.disconnect(force=True), timeout=10)
+    except asyncio.TimeoutError:
+        pass
+    except Exception as ex:
+        logging.warning("Voice disconnect failed in guild %s: %s", guild.id, ex)
+
+
+def _has_humans(channel) -> bool:
+    return any(not m.bot for m in getattr(channel, "members", []))
+
+
+if bot is not None:
+    @bot.listen("on_voice_state_update")
+    async def _voice_state_listener(member, before, after):
+        guild = member.guild
+        if bot.user and member.id == bot.user.id:
+            if after.channel is None:
+                cancel_idle_disconnect(guild.id)
+            return
+        vc = get_voice_client(guild)
+        if not vc or not vc.is_connected() or before.channel != vc.channel:
+            return
+        if _has_humans(vc.channel) or vc.is_playing() or vc.is_paused():
+            # Still playing: the idle timer takes over once the queue is done
+            return
+        logging.info("Voice channel emptied in guild %s; disconnecting.", guild.id)
+        await disconnect(guild)
@@ -0,0 +1,509 @@
+"""Single yt-dlp resolver shared by audio_player, /music and /yt.
+
+All extraction runs in one bounded ProcessPoolExecutor whose workers import
+yt_dlp once at start-up. Pool size comes from `ytdlp_workers` in config.json
+(or the YTDLP_WORKERS env var, default 3) and the pool is only created on first
+use, so profiles that never touch YouTube spawn no worker at all.
+
+Use the async `get_info` / `search` / `expand_to_videos` helpers from the bot;
+they record how long each call waited for a free worker and how long the
+extraction itself took (see `resolver_stats`).
+
+`get_info` is backed by a persistent metadata cache (data/ytdlp_cache.json):
+title, duration, live status and chosen format are kept durably, and the
+direct googlevideo stream URL is reused until its `expire` timestamp minus a
+safety margin, so replaying or looping a track skips extraction entirely.
+
+The player_client order is not fixed: each attempt's outcome and latency feed
+a per-client sliding window (`client_order`), so a client that starts failing
+is tried last instead of costing every request a failed extraction. With
+`ytdlp_hedge_after_seconds` set, a slow first attempt is raced against the
+remaining clients on a second worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+try:  # Package relative import (python -m discordbot.main)
+    from .config_service import get_config  # type: ignore
+except ImportError:  # script fallback
+    from config_service import get_config  # type: ignore
+
+YTDLP_CLIENT_ORDER = ["android", "ios", "web"]
+DEFAULT_WORKERS = 3
+_METRICS_WINDOW = 200
+
+# Adaptive client ordering: last N attempts per client, forgotten after the TTL
+# so a demoted client gets retried once it may have recovered.
+CLIENT_STATS_WINDOW = 50
+CLIENT_STATS_TTL = 30 * 60
+_CLIENT_PRIOR_SECONDS = 3.0
+
+BASE_DIR = Path(__file__).resolve().parent
+INFO_CACHE_PATH = BASE_DIR / "data" / "ytdlp_cache.json"
+INFO_CACHE_MAX_ENTRIES = 2000
+# Stop handing out a stream URL this long before YouTube says it expires
+STREAM_URL_SAFETY_MARGIN = 600
+_INFO_CACHE_SAVE_DELAY = 5
+# Everything the callers (audio_player, /music, /yt) read from an info dict,
+# plus the thumbnail for embeds; `formats` is not kept, `url` stands in for it
+_META_FIELDS = (
+    "id", "title", "duration", "is_live", "live_status", "webpage_url", "original_url",
+    "uploader", "thumbnail", "format_id", "ext", "acodec", "abr", "__client",
+)
+
+
+def _make_ydl_opts(client: str):
+    return {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'format': 'bestaudio/best',
+        'extractor_args': {
+            # Workaround for YouTube SABR streaming blocking some web formats
+            'youtube': {
+                'player_client': [client]
+            }
+        },
+    }
+
+
+def _make_playlist_opts(client: str):
+    # Options to expand playlist entries without downloading media
+    base = _make_ydl_opts(client).copy()
+    base['noplaylist'] = False
+    base['extract_flat'] = 'in_playlist'
+    base['skip_download'] = True
+    return base
+
+
+# ===========================
+# Worker side (pool processes)
+# ===========================
+
+def _worker_init():
+    # Pay the yt_dlp import (and its extractor registry) once per worker
+    import yt_dlp  # noqa: F401
+
+
+def _try_clients(clients, attempt, attempts):
+    """Call `attempt(client)` for each client in order until one succeeds.
+
+    Every try is appended to `attempts` as (client, ok, seconds) so the bot
+    process can learn which player_client is currently healthy.
+    """
+    last_exc = None
+    for client in clients or YTDLP_CLIENT_ORDER:
+        t0 = time.time()
+        try:
+            result = attempt(client)
+        except Exception as exc:
+            attempts.append((client, False, time.time() - t0))
+            last_exc = exc
+            continue
+        attempts.append((client, True, time.time() - t0))
+        return result
+    # If all attempts failed, raise the last exception
+    raise last_exc
+
+
+def ytdlp_get_info(url, clients=None, attempts=None):
+    import yt_dlp
+
+    def attempt(client):
+        with yt_dlp.YoutubeDL(_make_ydl_opts(client)) as ydl:
+            info = ydl.extract_info(url, download=False)
+            info['__client'] = client
+            return info
+
+    return _try_clients(clients, attempt, attempts if attempts is not None else [])
+
+
+def ytdlp_search(query, clients=None, attempts=None):
+    import yt_dlp
+
+    def attempt(client):
+        with yt_dlp.YoutubeDL(_make_ydl_opts(client)) as ydl:
+            res = ydl.extract_info(f"ytsearch3:{query}", download=False)
+            return res.get('entries') if isinstance(res, dict) else res
+
+    return _try_clients(clients, attempt, attempts if attempts is not None else [])
+
+
+def ytdlp_expand_to_videos(url, clients=None, attempts=None):
+    """Return a list of YouTube video webpage URLs for a given video or playlist URL."""
+    import yt_dlp
+
+    def attempt(client):
+        with yt_dlp.YoutubeDL(_make_playlist_opts(client)) as ydl:
+            info = ydl.extract_info(url, download=False)
+            # If it's a playlist, info will typically have 'entries'
+            if isinstance(info, dict) and info.get('entries'):
+                out = []
+                for e in info['entries']:
+                    wp = e.get('webpage_url') or e.get('url')
+                    if wp and not str(wp).startswith('http'):
+                        wp = f"https://www.youtube.com/watch?v={wp}"
+                    if wp:
+                        out.append(wp)
+                if out:
+                    return out
+            # Single video fallback
+            wp = info.get('webpage_url', url) if isinstance(info, dict) else url
+            return [wp]
+
+    return _try_clients(clients, attempt, attempts if attempts is not None else [])
+
+
+_OPERATIONS = {
+    "info": ytdlp_get_info,
+    "search": ytdlp_search,
+    "expand": ytdlp_expand_to_videos,
+}
+
+
+def _run_in_worker(op, arg, clients=None):
+    """Run one operation and report (started_at, finished_at, ok, result_or_error, attempts)."""
+    started = time.time()
+    attempts = []
+    try:
+        result = _OPERATIONS[op](arg, clients, attempts)
+        return started, time.time(), True, result, attempts
+    except Exception as exc:
+        # yt-dlp exceptions don't always survive pickling; keep the message only
+        return started, time.time(), False, RuntimeError(str(exc)), attempts
+
+
+# ===========================
+# Bot side
+# ===========================
+
+_executor = None
+_pool_size = None
+_executor_lock = threading.Lock()
+_metrics = defaultdict(lambda: deque(maxlen=_METRICS_WINDOW))
+_totals = defaultdict(lambda: {"calls": 0, "errors": 0, "hedged": 0})
+# client -> recent (timestamp, ok, seconds) attempts
+_client_samples = defaultdict(lambda: deque(maxlen=CLIENT_STATS_WINDOW))
+
+
+def _worker_count() -> int:
+    raw = os.getenv("YTDLP_WORKERS") or (get_config() or {}).get("ytdlp_workers")
+    try:
+        return max(1, int(raw)) if raw else DEFAULT_WORKERS
+    except (TypeError, ValueError):
+        return DEFAULT_WORKERS
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor, _pool_size
+    with _executor_lock:
+        if _executor is None:
+            _pool_size = _worker_count()
+            logging.info("Starting yt-dlp resolver pool with %d worker(s).", _pool_size)
+            _executor = ProcessPoolExecutor(max_workers=_pool_size, initializer=_worker_init)
+        return _executor
+
+
+def _record(op: str, queue_wait: float, exec_time: float, ok: bool) -> None:
+    _metrics[op].append((queue_wait, exec_time))
+    totals = _totals[op]
+    totals["calls"] += 1
+    if not ok:
+        totals["errors"] += 1
+
+
+def _record_client(client: str, ok: bool, seconds: float) -> None:
+    _client_samples[client].append((time.time(), ok, seconds))
+
+
+def _client_health(client: str) -> dict:
+    cutoff = time.time() - CLIENT_STATS_TTL
+    recent = [(ok, secs) for ts, ok, secs in _client_samples.get(client, ()) if ts >= cutoff]
+    successes = sum(1 for ok, _ in recent if ok)
+    # Laplace-smoothed so an unseen client starts at 50% rather than 0 or 100
+    rate = (successes + 1) / (len(recent) + 2)
+    latency = (sum(secs for _, secs in recent) + _CLIENT_PRIOR_SECONDS) / (len(recent) + 1)
+    return {"samples": len(recent), "success_rate": rate, "avg_seconds": latency}
+
+
+def client_order() -> list:
+    """player_client order, cheapest expected time-to-success first.
+
+    Expected cost is average attempt latency divided by success rate, both over
+    the recent window; ties keep the static YTDLP_CLIENT_ORDER.
+    """
+    def cost(item):
+        idx, client = item
+        health = _client_health(client)
+        return (health["avg_seconds"] / health["success_rate"], idx)
+
+    return [client for _, client in sorted(enumerate(YTDLP_CLIENT_ORDER), key=cost)]
+
+
+def _hedge_delay() -> float:
+    # 0 (default) disables hedging; each hedge holds a second worker
+    raw = (get_config() or {}).get("ytdlp_hedge_after_seconds", 0)
+    try:
+        return max(0.0, float(raw or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def _submit_clients(op: str, arg, clients):
+    loop = asyncio.get_running_loop()
+    submitted = time.time()
+    started, finished, ok, payload, attempts = await loop.run_in_executor(
+        get_executor(), _run_in_worker, op, arg, list(clients)
+    )
+    queue_wait = max(0.0, started - submitted)
+    exec_time = max(0.0, finished - started)
+    _record(op, queue_wait, exec_time, ok)
+    for client, client_ok, seconds in attempts:
+        _record_client(client, client_ok, seconds)
+    logging.debug(
+        "yt-dlp %s: waited %.2fs, ran %.2fs via %s (%s)",
+        op, queue_wait, exec_time, [a[0] for a in attempts], "ok" if ok else "error",
+    )
+    if not ok:
+        raise payload
+    return payload
+
+
+def _consume_result(fut) -> None:
+    # Losing hedge: keep its stats, drop its outcome quietly
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def _submit(op: str, arg, *, hedge: bool = False):
+    order = client_order()
+    delay = _hedge_delay() if hedge else 0.0
+    if delay <= 0 or len(order) < 2:
+        return await _submit_clients(op, arg, order)
+
+    primary = asyncio.ensure_future(_submit_clients(op, arg, order[:1]))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        if primary.exception() is None:
+            return primary.result()
+        return await _submit_clients(op, arg, order[1:])
+
+    # Primary client is slow: race it against the remaining clients
+    _totals[op]["hedged"] += 1
+    pending = {primary, asyncio.ensure_future(_submit_clients(op, arg, order[1:]))}
+    last_exc = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    return fut.result()
+                last_exc = fut.exception()
+    finally:
+        for fut in pending:
+            fut.add_done_callback(_consume_result)
+    raise last_exc
+
+
+# ===========================
+# Metadata / stream URL cache
+# ===========================
+
+_info_cache: Optional[dict] = None
+_info_cache_lock = threading.Lock()
+_info_cache_save_task: Optional[asyncio.Task] = None
+_info_cache_counts = {"hits": 0, "misses": 0}
+
+_YT_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/live/|/embed/)([A-Za-z0-9_-]{11})")
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+
+
+def _cache_key(url: str) -> str:
+    m = _YT_ID_RE.search(url or "")
+    return f"yt:{m.group(1)}" if m else (url or "")
+
+
+def _stream_url_of(info: dict) -> Optional[str]:
+    stream_url = info.get("url")
+    if not stream_url:
+        for f in reversed(info.get("formats", []) or []):
+            if f.get("acodec") != "none" and f.get("vcodec") == "none":
+                return f.get("url")
+    return stream_url
+
+
+def stream_url_expiry(stream_url: Optional[str]) -> Optional[int]:
+    """Return the `expire` unix timestamp embedded in a googlevideo URL, if any."""
+    m = _EXPIRE_RE.search(stream_url or "")
+    return int(m.group(1)) if m else None
+
+
+def _load_info_cache() -> dict:
+    # Caller holds _info_cache_lock
+    global _info_cache
+    if _info_cache is None:
+        try:
+            with open(INFO_CACHE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _info_cache = data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            _info_cache = {}
+        except Exception as ex:
+            logging.warning("Ignoring unreadable yt-dlp cache %s: %s", INFO_CACHE_PATH, ex)
+            _info_cache = {}
+    return _info_cache
+
+
+def _load_info_cache_locked() -> None:
+    with _info_cache_lock:
+        _load_info_cache()
+
+
+async def _ensure_info_cache_loaded() -> None:
+    # The first read parses the whole JSON file: keep it off the event loop
+    if _info_cache is None:
+        await asyncio.get_running_loop().run_in_executor(None, _load_info_cache_locked)
+
+
+def _save_info_cache() -> None:
+    with _info_cache_lock:
+        snapshot = json.dumps(_load_info_cache(), ensure_ascii=False)
+    INFO_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = str(INFO_CACHE_PATH) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(snapshot)
+    os.replace(tmp_path, INFO_CACHE_PATH)
+
+
+async def _save_info_cache_later() -> None:
+    global _info_cache_save_task
+    try:
+        await asyncio.sleep(_INFO_CACHE_SAVE_DELAY)
+        await asyncio.get_running_loop().run_in_executor(None, _save_info_cache)
+    except Exception as ex:
+        logging.warning("Failed to persist yt-dlp cache: %s", ex)
+    finally:
+        _info_cache_save_task = None
+
+
+def _schedule_info_cache_save() -> None:
+    # Coalesce bursts of updates into one write off the event loop
+    global _info_cache_save_task
+    if _info_cache_save_task is None:
+        _info_cache_save_task = asyncio.create_task(_save_info_cache_later())
+
+
+def _remember_info(url: str, info: dict) -> None:
+    now = time.time()
+    meta = {k: info.get(k) for k in _META_FIELDS if info.get(k) is not None}
+    entry = {"meta": meta, "updated": now, "last_used": now}
+    is_live = bool(info.get("is_live")) or info.get("live_status") == "is_live"
+    stream_url = _stream_url_of(info)
+    expires = stream_url_expiry(stream_url)
+    if stream_url and expires and not is_live:
+        entry["stream_url"] = stream_url
+        entry["stream_expires"] = expires
+    keys = {_cache_key(url)}
+    if info.get("webpage_url"):
+        keys.add(_cache_key(info["webpage_url"]))
+    with _info_cache_lock:
+        cache = _load_info_cache()
+        for key in keys:
+            cache[key] = entry
+        if len(cache) > INFO_CACHE_MAX_ENTRIES:
+            oldest = sorted(cache, key=lambda k: cache[k].get("last_used", 0))
+            for key in oldest[: len(cache) - INFO_CACHE_MAX_ENTRIES]:
+                del cache[key]
+    _schedule_info_cache_save()
+
+
+def _cached_info(url: str) -> Optional[dict]:
+    """Return a playable info dict from the cache while its stream URL is still valid."""
+    with _info_cache_lock:
+        entry = _load_info_cache().get(_cache_key(url))
+        if not entry or not entry.get("stream_url"):
+            return None
+        if entry.get("stream_expires", 0) - STREAM_URL_SAFETY_MARGIN <= time.time():
+            return None
+        entry["last_used"] = time.time()
+        info = dict(entry.get("meta") or {})
+        info["url"] = entry["stream_url"]
+    info["__cached"] = True
+    return info
+
+
+def peek_metadata(url: str) -> Optional[dict]:
+    """Cached title/duration/etc. for `url` without any extraction (stream URL not included).
+
+    Reads data/ytdlp_cache.json on first use: call it from an executor, or after `get_info`.
+    """
+    with _info_cache_lock:
+        entry = _load_info_cache().get(_cache_key(url))
+        return dict(entry["meta"]) if entry and entry.get("meta") else None
+
+
+async def get_info(url: str, *, use_cache: bool = True) -> dict:
+    """yt-dlp info for `url`.
+
+    A cache hit (`info["__cached"]` is True) carries only the `_META_FIELDS`
+    that were present plus the direct stream `url`; it has no `formats`,
+    `thumbnails` or other extractor fields. Pass `use_cache=False` when you
+    need the full extraction.
+    """
+    await _ensure_info_cache_loaded()
+    if use_cache:
+        cached = _cached_info(url)
+        if cached is not None:
+            _info_cache_counts["hits"] += 1
+            return cached
+        _info_cache_counts["misses"] += 1
+    info = await _submit("info", url, hedge=True)
+    if isinstance(info, dict):
+        _remember_info(url, info)
+    return info
+
+
+async def search(query: str):
+    return await _submit("search", query, hedge=True)
+
+
+async def expand_to_videos(url: str) -> list:
+    return await _submit("expand", url)
+
+
+def _summary(samples):
+    if not samples:
+        return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": sum(ordered) / len(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def resolver_stats() -> dict:
+    """Per-operation call counts plus queue-wait / execution-time summaries (seconds)."""
+    out = {
+        "workers": _pool_size or _worker_count(),
+        "info_cache": dict(_info_cache_counts),
+        "client_order": client_order(),
+        "clients": {client: _client_health(client) for client in YTDLP_CLIENT_ORDER},
+    }
+    for op, samples in _metrics.items():
+        out[op] = {
+            **_totals[op],
+            "queue_wait": _summary([w for w, _ in samples]),
+            "exec_time": _summary([e for _, e in samples]),
+        }
+    return out
@@ -0,0 +1,19 @@
+from discordbot.joke_index import _RecentJokes
+
+
+def test_recent_jokes_evicts_oldest():
+    recent = _RecentJokes(2)
+    for key in ("a", "b", "c"):
+        recent.add(key)
+    assert "a" not in recent
+    assert list(recent.order) == ["b", "c"]
+    assert recent.members == {"b", "c"}
+
+
+def test_recent_jokes_size_zero_tracks_nothing():
+    recent = _RecentJokes(0)
+    for key in ("a", "b", "a"):
+        recent.add(key)
+    assert "a" not in recent
+    assert not recent.order
+    assert not recent.members